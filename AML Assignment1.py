@@ -45,12 +45,7 @@ decoded_review = " ".join(
 """
 
 import numpy as np
-def vectorize_sequences(sequences, dimension=10000):
-    results = np.zeros((len(sequences), dimension))
-    for i, sequence in enumerate(sequences):
-        for j in sequence:
-            results[i, j] = 1.
-    return results
+from imdb_encoding import vectorize_sequences
 x_train = vectorize_sequences(train_data)
 x_test = vectorize_sequences(test_data)
 
@@ -206,7 +201,7 @@ plt.legend()
 plt.show()
 
 model_11.fit(x_train, y_train, epochs=12, batch_size=512)
-results_M11 = model.evaluate(x_test, y_test)
+results_M11 = model_11.evaluate(x_test, y_test)
 results_M11
 
 """HYPERTUNING
@@ -606,11 +601,15 @@ results_Hyper
 
 """Summary of all models"""
 
-All_Loss= np.array([results_Dropout[0],results_Hyper[0],results_MSE[0],results_regularisation[0],results_tanh[0]])*100
+All_Results = {'Model_11': results_M11, 'Model_21': results_M21, 'Model_22': results_M22,
+               'Model_23': results_M23, 'Model_Dropout': results_Dropout, 'Model_Hyper': results_Hyper,
+               'Model_MSE': results_MSE, 'model_regularisation': results_regularisation,
+               'model_tanh': results_tanh}
+All_Loss= np.array([result[0] for result in All_Results.values()])*100
 All_Loss
-All_Accuracy= np.array([results_Dropout[1],results_Hyper[1],results_MSE[1],results_regularisation[1],results_tanh[1]])*100
+All_Accuracy= np.array([result[1] for result in All_Results.values()])*100
 All_Accuracy
-Labels=['Model_Dropout','Model_Hyper','Model_MSE','model_regularisation','model_tanh']
+Labels=list(All_Results)
 
 plt.clf()
 
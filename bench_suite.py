@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""Repeatable benchmark of every stage the assignment script runs.
+
+Stages: `imdb.load_data`, `vectorize_sequences` on train and test, then for
+each variant in `imdb_models.VARIANTS` one `fit` epoch on `x_train` at
+`batch_size=512`, `evaluate` and `predict` on `x_test`. Thread counts and
+seeds are pinned, each stage gets warm-up runs and several timed
+repetitions, and the results are written as JSON. Given a baseline file,
+every stage's median is compared against it and the run fails (exit code 1)
+if any stage got slower than the tolerance allows.
+
+    python bench_suite.py --output bench.json --save-baseline bench_baseline.json
+    python bench_suite.py --baseline bench_baseline.json --tolerance 0.1
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+
+def measure(fn, warmup=1, repeat=5):
+    for _ in range(warmup):
+        fn()
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - start)
+    return {"median": statistics.median(runs), "min": min(runs), "runs": runs}
+
+
+def run_suite(variants, threads=1, seed=0, warmup=1, repeat=5, log=print):
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(threads)
+    from tensorflow import keras
+    from tensorflow.keras.datasets import imdb
+
+    from imdb_encoding import vectorize_sequences
+    from imdb_models import build_model, variant_config
+
+    results = {}
+
+    def stage(name, fn, **kwargs):
+        results[name] = measure(fn, **{"warmup": warmup, "repeat": repeat, **kwargs})
+        log(f"{name:<32} median {results[name]['median']:8.4f} s")
+
+    stage("load_data", lambda: imdb.load_data(num_words=10000))
+    (train_data, train_labels), (test_data, test_labels) = imdb.load_data(num_words=10000)
+    stage("vectorize_train", lambda: vectorize_sequences(train_data))
+    stage("vectorize_test", lambda: vectorize_sequences(test_data))
+    x_train = vectorize_sequences(train_data)
+    x_test = vectorize_sequences(test_data)
+    y_train = train_labels.astype("float32")
+    y_test = test_labels.astype("float32")
+
+    for name in variants:
+        keras.utils.set_random_seed(seed)
+        model = build_model(variant_config(name))
+        stage(f"fit/{name}", lambda: model.fit(x_train, y_train, epochs=1,
+                                                batch_size=512, verbose=0))
+        stage(f"evaluate/{name}", lambda: model.evaluate(x_test, y_test,
+                                                          batch_size=512, verbose=0))
+        stage(f"predict/{name}", lambda: model.predict(x_test, batch_size=512, verbose=0))
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Per-stage median ratio against the baseline, and the regressed stages."""
+    diff = {}
+    regressions = []
+    for name, stats in results.items():
+        if name not in baseline:
+            continue
+        ratio = stats["median"] / baseline[name]["median"]
+        diff[name] = ratio
+        if ratio > 1 + tolerance:
+            regressions.append(name)
+    return diff, regressions
+
+
+def main(argv=None):
+    from imdb_models import VARIANTS
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("variants", nargs="*", default=list(VARIANTS))
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", default="bench.json")
+    parser.add_argument("--baseline")
+    parser.add_argument("--save-baseline")
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    args = parser.parse_args(argv)
+
+    # Pin the BLAS/OpenMP pools too, before TensorFlow starts them.
+    os.environ["OMP_NUM_THREADS"] = str(args.threads)
+    results = run_suite(args.variants, args.threads, args.seed, args.warmup, args.repeat)
+    report = {
+        "machine": {"platform": platform.platform(), "processor": platform.processor(),
+                    "cpus": os.cpu_count(), "python": platform.python_version()},
+        "settings": {"threads": args.threads, "seed": args.seed,
+                     "warmup": args.warmup, "repeat": args.repeat},
+        "results": results,
+    }
+    status = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        diff, regressions = compare(results, baseline, args.tolerance)
+        report["diff"] = diff
+        report["regressions"] = regressions
+        for name, ratio in diff.items():
+            flag = "  REGRESSION" if name in regressions else ""
+            print(f"{name:<32} {ratio:6.2f}x baseline{flag}")
+        status = 1 if regressions else 0
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=1)
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(report, f, indent=1)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""Benchmark: multi-hot `Dense` input layer vs the `TokenBagDense` gather-sum.
+
+For the 16/32/64/128-unit variants this checks that both first layers give
+the same outputs on the same weights, then times a training epoch and a
+test-set prediction for each input path.
+"""
+
+import time
+
+import numpy as np
+from tensorflow.keras.datasets import imdb
+
+from imdb_encoding import vectorize_sequences
+from imdb_models import build_model, variant_config
+from imdb_pipeline import make_token_dataset
+
+WIDTH_VARIANTS = ["model", "model_21", "model_22", "model_23"]
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    (train_data, train_labels), (test_data, test_labels) = imdb.load_data(
+        num_words=10000)
+    y_train = np.asarray(train_labels).astype("float32")
+    x_train = vectorize_sequences(train_data, dtype="float32")
+    x_test = vectorize_sequences(test_data, dtype="float32")
+    train_tokens = make_token_dataset(train_data, y_train, shuffle=True)
+    test_tokens = make_token_dataset(test_data)
+
+    distinct = np.mean([len(set(sequence)) for sequence in train_data])
+    print(f"distinct words per review: {distinct:.0f} of 10000 "
+          f"(first-layer FLOPs down ~{10000 / distinct:.0f}x)")
+    for name in WIDTH_VARIANTS:
+        config = variant_config(name)
+        dense = build_model(config)
+        tokens = build_model(config, token_input=True)
+        dense.predict(x_test[:1], verbose=0)
+        tokens.predict(test_tokens.take(1), verbose=0)
+        tokens.set_weights(dense.get_weights())
+        expected = dense.predict(x_test, batch_size=512, verbose=0)
+        actual = tokens.predict(test_tokens, verbose=0)
+        max_error = np.abs(expected - actual).max()
+
+        # One warm-up epoch each, so tracing is not timed.
+        dense.fit(x_train, y_train, epochs=1, batch_size=512, verbose=0)
+        tokens.fit(train_tokens, epochs=1, verbose=0)
+        dense_fit = timed(lambda: dense.fit(x_train, y_train, epochs=1,
+                                            batch_size=512, verbose=0))
+        tokens_fit = timed(lambda: tokens.fit(train_tokens, epochs=1, verbose=0))
+        dense_predict = timed(lambda: dense.predict(x_test, batch_size=512, verbose=0))
+        tokens_predict = timed(lambda: tokens.predict(test_tokens, verbose=0))
+        print(f"{name:<9} units {config['units'][0]:>3}  max |diff| {max_error:.1e}  "
+              f"fit {dense_fit:6.2f} s -> {tokens_fit:6.2f} s "
+              f"({dense_fit / tokens_fit:4.1f}x)  "
+              f"predict {dense_predict:6.2f} s -> {tokens_predict:6.2f} s "
+              f"({dense_predict / tokens_predict:4.1f}x)")
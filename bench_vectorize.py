@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""Micro-benchmark: loop-based `vectorize_sequences` vs the batched builder.
+
+Encodes the full 25k-review training split both ways and checks that the
+results are identical.
+"""
+
+import time
+
+import numpy as np
+from tensorflow.keras.datasets import imdb
+
+from imdb_encoding import vectorize_sequences
+
+
+def vectorize_sequences_loop(sequences, dimension=10000):
+    results = np.zeros((len(sequences), dimension))
+    for i, sequence in enumerate(sequences):
+        for j in sequence:
+            results[i, j] = 1.
+    return results
+
+
+def best_of(fn, repeat=3):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+if __name__ == "__main__":
+    (train_data, _), _ = imdb.load_data(num_words=10000)
+
+    loop_time, expected = best_of(lambda: vectorize_sequences_loop(train_data))
+    print(f"python loop          : {loop_time:8.3f} s")
+    for dtype in ["float64", "float32", "uint8"]:
+        fast_time, result = best_of(lambda: vectorize_sequences(train_data, dtype=dtype))
+        assert np.array_equal(result, expected)
+        print(f"batched ({dtype:>7})  : {fast_time:8.3f} s"
+              f"  ({loop_time / fast_time:.0f}x, {result.nbytes / 2**20:.0f} MiB)")
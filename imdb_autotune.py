@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""XLA-compiled training and a CPU thread/batch-size autotuner.
+
+The variants are small MLPs, so at the script's settings a training step
+is dominated by per-op dispatch and by TensorFlow's default thread pools
+oversubscribing the cores. `autotune` probes, one setting at a time:
+
+    jit_compile   XLA-compile the train/predict steps (False, True)
+    intra         intra-op threads (TF default, 1, 2, 4, ..., all cores)
+    inter         inter-op threads (TF default, 1, 2)
+    batch_size    256, 512, 1024, 2048
+
+Thread pools can only be sized before TensorFlow starts, so every probe
+runs in a fresh subprocess that trains a few epochs on a slice of the
+cached training set and reports its steady-state steps/sec. Settings are
+compared by examples/sec, which stays comparable across batch sizes. The
+best setting is stored per architecture (the config without its epoch
+count) and per machine (host, CPU model, usable cores, TF version) in
+`autotune.json` in the cache directory; `tuned_options` reads it back.
+Note that a different batch size also changes the optimisation itself.
+
+    python imdb_autotune.py                    # tune every variant
+    python imdb_autotune.py model_23 --no-batch
+"""
+
+import hashlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from importlib import metadata
+
+import imdb_cache
+from imdb_registry import config_hash
+from imdb_sweep import available_cores
+
+DEFAULT_SETTINGS = {"jit_compile": False, "intra": 0, "inter": 0, "batch_size": 512}
+BATCH_SIZES = (256, 512, 1024, 2048)
+TUNED_PATH = os.path.join(imdb_cache.CACHE_DIR, "autotune.json")
+
+
+def _cpu_model():
+    try:
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor()
+
+
+def _tensorflow_version():
+    for distribution in ["tensorflow", "tensorflow-cpu", "tensorflow-macos"]:
+        try:
+            return metadata.version(distribution)
+        except metadata.PackageNotFoundError:
+            pass
+    return None
+
+
+def machine_key():
+    """Hash of what the tuned settings depend on besides the model."""
+    machine = [platform.node(), platform.machine(), _cpu_model(),
+               len(available_cores()), _tensorflow_version()]
+    return hashlib.sha256(json.dumps(machine).encode()).hexdigest()[:16]
+
+
+def architecture_key(config):
+    return config_hash({key: value for key, value in config.items() if key != "epochs"})
+
+
+def _thread_counts():
+    cores = len(available_cores())
+    counts = [1]
+    while counts[-1] * 2 < cores:
+        counts.append(counts[-1] * 2)
+    return [0] + sorted(set(counts + [cores]))
+
+
+def probe(config, settings, num_words=10000, examples=8192, epochs=3):
+    """Steps/sec and examples/sec of `config` under `settings`, in a subprocess."""
+    request = json.dumps({"config": config, "settings": settings, "num_words": num_words,
+                          "examples": examples, "epochs": epochs})
+    output = subprocess.run([sys.executable, __file__, "--probe", request],
+                            check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def _run_probe(request):
+    import numpy as np
+    import tensorflow as tf
+
+    settings = request["settings"]
+    tf.config.threading.set_intra_op_parallelism_threads(settings["intra"])
+    tf.config.threading.set_inter_op_parallelism_threads(settings["inter"])
+    from imdb_models import build_model
+    from imdb_pipeline import StepRate
+
+    data = imdb_cache.load_encoded(num_words=request["num_words"])
+    x = np.asarray(data["x_train"][:request["examples"]])
+    y = np.asarray(data["y_train"][:request["examples"]])
+    model = build_model(request["config"], num_words=request["num_words"],
+                        jit_compile=settings["jit_compile"])
+    rate = StepRate()
+    model.fit(x, y, epochs=request["epochs"], batch_size=settings["batch_size"],
+              callbacks=[rate], verbose=0)
+    # The first epoch includes tracing (and XLA compilation); report the steady state.
+    steps_per_sec = float(np.mean(rate.steps_per_sec[1:]))
+    steps_per_epoch = -(-len(x) // settings["batch_size"])
+    print(json.dumps({"steps_per_sec": steps_per_sec,
+                      "examples_per_sec": steps_per_sec * len(x) / steps_per_epoch}))
+
+
+def load_tuned(path=TUNED_PATH):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_tuned(key, record, path=TUNED_PATH):
+    tuned = load_tuned(path)
+    tuned[key] = record
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(tuned, f, indent=1)
+    os.replace(tmp, path)
+
+
+def autotune(config, num_words=10000, tune_batch=True, path=TUNED_PATH, **probe_options):
+    """Coordinate search over `DEFAULT_SETTINGS`; stores and returns the result.
+
+    The record holds the best `settings`, and the `before` (defaults) and
+    `after` (best) probe results.
+    """
+    start = time.perf_counter()
+    best = dict(DEFAULT_SETTINGS)
+    before = probe(config, best, num_words, **probe_options)
+    best_result = before
+    searches = [("jit_compile", [True]), ("intra", _thread_counts()), ("inter", [0, 1, 2])]
+    if tune_batch:
+        searches.append(("batch_size", BATCH_SIZES))
+    num_probes = 1
+    for name, values in searches:
+        for value in values:
+            if value == best[name]:
+                continue
+            candidate = {**best, name: value}
+            result = probe(config, candidate, num_words, **probe_options)
+            num_probes += 1
+            if result["examples_per_sec"] > best_result["examples_per_sec"]:
+                best, best_result = candidate, result
+    record = {"settings": best, "before": before, "after": best_result,
+              "probes": num_probes, "tuning_time": time.perf_counter() - start}
+    save_tuned(f"{machine_key()}/{architecture_key(config)}", record, path)
+    return record
+
+
+def tuned_options(config, path=TUNED_PATH):
+    """Apply the stored settings for `config` on this machine.
+
+    Sizes TensorFlow's thread pools (so it must run before TensorFlow is
+    first used) and returns the `batch_size`/`jit_compile` keyword
+    arguments for `imdb_models.train_variant`; empty if never tuned.
+    """
+    record = load_tuned(path).get(f"{machine_key()}/{architecture_key(config)}")
+    if record is None:
+        return {}
+    settings = record["settings"]
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(settings["intra"])
+    tf.config.threading.set_inter_op_parallelism_threads(settings["inter"])
+    return {"batch_size": settings["batch_size"], "jit_compile": settings["jit_compile"]}
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--probe"]:
+        _run_probe(json.loads(sys.argv[2]))
+        sys.exit()
+
+    import argparse
+
+    from imdb_models import VARIANTS, variant_config
+
+    parser = argparse.ArgumentParser(description="Tune XLA, threads and batch size per variant.")
+    parser.add_argument("variants", nargs="*", default=list(VARIANTS))
+    parser.add_argument("--no-batch", action="store_true", help="keep batch_size=512")
+    parser.add_argument("--examples", type=int, default=8192)
+    parser.add_argument("--epochs", type=int, default=3)
+    args = parser.parse_args()
+
+    imdb_cache.load_encoded()  # build the cache once, not in every probe
+    for name in args.variants:
+        record = autotune(variant_config(name), tune_batch=not args.no_batch,
+                          examples=args.examples, epochs=args.epochs)
+        before, after, settings = record["before"], record["after"], record["settings"]
+        print(f"{name:<22} {before['steps_per_sec']:7.1f} -> {after['steps_per_sec']:7.1f}"
+              f" steps/s  {before['examples_per_sec']:8.0f} -> {after['examples_per_sec']:8.0f}"
+              f" ex/s  ({record['probes']} probes)  jit={settings['jit_compile']}"
+              f" intra={settings['intra']} inter={settings['inter']}"
+              f" batch={settings['batch_size']}")
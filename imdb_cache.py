@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""On-disk cache for the loaded and encoded IMDB tensors.
+
+The first run loads the dataset through Keras, encodes it and writes the
+train/test matrices and labels as `.npy` files. Later runs memory-map those
+files with `np.load(mmap_mode="r")`, so neither the Keras loader nor the
+encoder has to run before the first `fit`.
+
+Entries are keyed by `num_words`, the encoding variant ("dense" or
+"packed") and the dtype. An entry is rebuilt when the Keras source files
+(`imdb.npz`, `imdb_word_index.json`) or `ENCODER_VERSION` change.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+ENCODER_VERSION = 1
+CACHE_DIR = os.environ.get(
+    "IMDB_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "imdb_encoded"))
+SOURCE_FILES = ["imdb.npz", "imdb_word_index.json"]
+
+
+def keras_datasets_dir():
+    keras_home = os.environ.get("KERAS_HOME", os.path.join(os.path.expanduser("~"), ".keras"))
+    return os.path.join(keras_home, "datasets")
+
+
+def source_fingerprint():
+    """Size and mtime of the files Keras loads the dataset from."""
+    fingerprint = {}
+    for name in SOURCE_FILES:
+        path = os.path.join(keras_datasets_dir(), name)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            fingerprint[name] = None
+        else:
+            fingerprint[name] = [stat.st_size, stat.st_mtime_ns]
+    return fingerprint
+
+
+def resolve_dtype(dtype):
+    """`np.dtype`, also for "bfloat16" (which NumPy knows via ml_dtypes)."""
+    if str(dtype) == "bfloat16":
+        import ml_dtypes
+        return np.dtype(ml_dtypes.bfloat16)
+    return np.dtype(dtype)
+
+
+def entry_dir(num_words, encoding, dtype, cache_dir=None):
+    name = f"imdb-{num_words}-{encoding}-{resolve_dtype(dtype).name}"
+    return os.path.join(cache_dir or CACHE_DIR, name)
+
+
+def _meta(num_words, encoding, dtype):
+    return {
+        "num_words": num_words,
+        "encoding": encoding,
+        "dtype": resolve_dtype(dtype).name,
+        "encoder_version": ENCODER_VERSION,
+        "source": source_fingerprint(),
+    }
+
+
+def _read_meta(path):
+    try:
+        with open(os.path.join(path, "meta.json")) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _encode(num_words, encoding, dtype):
+    from tensorflow.keras.datasets import imdb
+
+    from imdb_encoding import pack_sequences, vectorize_sequences
+
+    (train_data, train_labels), (test_data, test_labels) = imdb.load_data(
+        num_words=num_words)
+    word_index = imdb.get_word_index()
+    if encoding == "packed":
+        x_train = pack_sequences(train_data, num_words, dtype).bits
+        x_test = pack_sequences(test_data, num_words, dtype).bits
+    elif encoding == "dense":
+        x_train = vectorize_sequences(train_data, num_words, dtype)
+        x_test = vectorize_sequences(test_data, num_words, dtype)
+    else:
+        raise ValueError(f"Unknown encoding: {encoding!r}")
+    arrays = {
+        "x_train": x_train,
+        "x_test": x_test,
+        "y_train": np.asarray(train_labels).astype("float32"),
+        "y_test": np.asarray(test_labels).astype("float32"),
+    }
+    return arrays, word_index
+
+
+def _write(path, arrays, word_index, meta):
+    parent = os.path.dirname(path)
+    os.makedirs(parent, exist_ok=True)
+    tmp = tempfile.mkdtemp(dir=parent, prefix=".tmp-")
+    for name, array in arrays.items():
+        np.save(os.path.join(tmp, name + ".npy"), array)
+    with open(os.path.join(tmp, "word_index.json"), "w") as f:
+        json.dump(word_index, f)
+    # The refreshed fingerprint covers files Keras may have just downloaded.
+    meta = dict(meta, source=source_fingerprint())
+    with open(os.path.join(tmp, "meta.json"), "w") as f:
+        json.dump(meta, f)
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp, path)
+
+
+def load_encoded(num_words=10000, encoding="dense", dtype="float32",
+                 cache_dir=None, refresh=False):
+    """Return the encoded IMDB splits, building the cache entry if needed.
+
+    Returns a dict with `x_train`, `x_test`, `y_train`, `y_test` (memory-mapped
+    read-only arrays; `PackedMultiHot` for the packed encoding),
+    `word_index`, and `cache_hit`.
+    """
+    path = entry_dir(num_words, encoding, dtype, cache_dir)
+    meta = _meta(num_words, encoding, dtype)
+    cache_hit = not refresh and _read_meta(path) == meta
+    if not cache_hit:
+        arrays, word_index = _encode(num_words, encoding, dtype)
+        _write(path, arrays, word_index, meta)
+
+    data = {name: np.load(os.path.join(path, name + ".npy"), mmap_mode="r")
+            for name in ["x_train", "x_test", "y_train", "y_test"]}
+    if encoding == "packed":
+        from imdb_encoding import PackedMultiHot
+        for name in ["x_train", "x_test"]:
+            data[name] = PackedMultiHot(data[name], num_words, dtype)
+    with open(os.path.join(path, "word_index.json")) as f:
+        data["word_index"] = json.load(f)
+    data["cache_hit"] = cache_hit
+    return data
+
+
+if __name__ == "__main__":
+    for encoding in ["dense", "packed"]:
+        start = time.perf_counter()
+        load_encoded(encoding=encoding, refresh=True)
+        cold = time.perf_counter() - start
+        start = time.perf_counter()
+        data = load_encoded(encoding=encoding)
+        warm = time.perf_counter() - start
+        assert data["cache_hit"]
+        print(f"{encoding:>6}: cold start {cold:7.2f} s, warm start {warm:7.3f} s")
@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+"""Per-epoch checkpointing and resumable training of the model variants.
+
+`train_variant_resumable` runs the same two fits as
+`imdb_models.train_variant` (validation fit, then the final fit on
+`x_train`), one epoch at a time. After every epoch it snapshots the model
+variables (weights and Dropout seed-generator state), the optimizer
+variables and the history, and hands them to a background thread that
+writes them atomically, so the training step never waits on the disk.
+
+All randomness of an epoch is derived from `(seed, phase, epoch)`: the
+sample order comes from `EpochShuffled` and the global seed is reset before
+every epoch. A run resumed from its last checkpoint therefore continues
+with exactly the results of an uninterrupted one. Variants that finished
+are not retrained; their stored outcome is returned. Checkpoints and
+outcomes carry the `imdb_registry.config_hash` of the run (config, seed,
+options, data shape), and one written by a different run is ignored, so
+changing a variant's config starts it over.
+
+    python imdb_sweep.py --checkpoint-dir=checkpoints   # rerun to resume
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+from tensorflow import keras
+
+from imdb_encoding import IndexBatches, keras_inputs, validation_inputs
+from imdb_models import build_model, peak_rss_mb, reset_peak_rss, split_validation
+from imdb_registry import config_hash
+
+PHASES = ["validation", "final"]
+
+
+class AsyncCheckpointWriter:
+    """Writes checkpoints in order from a background thread.
+
+    `write` returns at once unless two checkpoints are already waiting, in
+    which case it blocks until one is written. `close` writes the rest and
+    stops the thread.
+    """
+
+    def __init__(self):
+        self.queue = queue.Queue(maxsize=2)
+        self.error = None
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def write(self, directory, arrays, state):
+        if self.error:
+            raise self.error
+        self.queue.put((directory, arrays, state))
+
+    def flush(self):
+        self.queue.join()
+        if self.error:
+            raise self.error
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+        if self.error:
+            raise self.error
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                self.queue.task_done()
+                return
+            directory, arrays, state = item
+            try:
+                save_checkpoint(directory, arrays, state)
+            except Exception as e:
+                self.error = e
+            finally:
+                self.queue.task_done()
+
+
+def save_checkpoint(directory, arrays, state):
+    """Write variables and state to one file, replaced atomically."""
+    os.makedirs(directory, exist_ok=True)
+    tmp = os.path.join(directory, ".checkpoint.tmp.npz")
+    np.savez(tmp, state=np.array(json.dumps(state)), **arrays)
+    os.replace(tmp, os.path.join(directory, "checkpoint.npz"))
+
+
+def load_checkpoint(directory):
+    try:
+        with np.load(os.path.join(directory, "checkpoint.npz")) as checkpoint:
+            arrays = dict(checkpoint)
+    except FileNotFoundError:
+        return None, None
+    return arrays, json.loads(str(arrays.pop("state")))
+
+
+def snapshot(model):
+    """Copies of all model and optimizer variables, safe to write later."""
+    arrays = {}
+    for i, variable in enumerate(model.variables):
+        arrays[f"model_{i}"] = np.array(variable.numpy())
+    for i, variable in enumerate(model.optimizer.variables):
+        arrays[f"optimizer_{i}"] = np.array(variable.numpy())
+    return arrays
+
+
+def restore(model, arrays):
+    for i, variable in enumerate(model.variables):
+        variable.assign(arrays[f"model_{i}"])
+    for i, variable in enumerate(model.optimizer.variables):
+        variable.assign(arrays[f"optimizer_{i}"])
+
+
+class EpochShuffled(IndexBatches):
+    """Batches of `x`, `y` in an order that depends only on (seed, epoch)."""
+
+    def __init__(self, x, y, batch_size=512, seed=0):
+        super().__init__(x, y, batch_size=batch_size)
+        self.seed = seed
+        self.set_epoch(0)
+
+    def set_epoch(self, epoch):
+        self.order = np.random.default_rng([self.seed, epoch]).permutation(len(self.x))
+
+
+def train_variant_resumable(name, config, data, checkpoint_dir, seed=0,
+                            validation_epochs=20, batch_size=512,
+                            precision="float32", writer=None, early_stopping=False,
+                            profile=False, jit_compile="auto"):
+    """`train_variant` with per-epoch checkpoints under `checkpoint_dir/name`.
+
+    Without a `writer`, one is started for this call and closed when it
+    returns.
+    """
+    if early_stopping or profile:
+        raise ValueError("early_stopping and profile are not supported with checkpointing")
+    directory = os.path.join(checkpoint_dir, name)
+    done_path = os.path.join(directory, "done.json")
+    validation_epochs = config.get("validation_epochs", validation_epochs)
+    run = config_hash(config, seed, validation_epochs=validation_epochs,
+                      batch_size=batch_size, precision=precision, jit_compile=jit_compile,
+                      data={name: list(data[name].shape) for name in ["x_train", "x_test"]})
+    try:
+        with open(done_path) as f:
+            outcome = json.load(f)
+    except (FileNotFoundError, ValueError):
+        outcome = None
+    if outcome is not None and outcome.get("run") == run:
+        outcome["resumed"] = "finished"
+        return outcome
+
+    if writer is None:
+        writer = AsyncCheckpointWriter()
+        try:
+            return train_variant_resumable(
+                name, config, data, checkpoint_dir, seed=seed,
+                validation_epochs=validation_epochs, batch_size=batch_size,
+                precision=precision, writer=writer, jit_compile=jit_compile)
+        finally:
+            writer.close()
+
+    start = time.perf_counter()
+    per_run_peak = reset_peak_rss()
+    partial_x_train, partial_y_train, x_val, y_val = split_validation(
+        data["x_train"], data["y_train"])
+
+    def fresh_model(random_seed):
+        keras.utils.set_random_seed(random_seed)
+        model = build_model(config, precision=precision, jit_compile=jit_compile)
+        model.build((None, data["x_train"].shape[1]))
+        model.optimizer.build(model.trainable_variables)
+        return model
+
+    model = fresh_model(seed)
+    arrays, state = load_checkpoint(directory)
+    if state is None or state.get("run") != run:
+        state = {"run": run, "phase": 0, "epoch": 0,
+                 "history": {phase: {} for phase in PHASES}}
+        resumed = None
+    else:
+        restore(model, arrays)
+        resumed = f"{PHASES[state['phase']]} epoch {state['epoch']}"
+
+    fits = [
+        (EpochShuffled(partial_x_train, partial_y_train, batch_size, seed),
+         validation_inputs(x_val, y_val, batch_size), validation_epochs),
+        (EpochShuffled(data["x_train"], data["y_train"], batch_size, seed + 1),
+         None, config["epochs"]),
+    ]
+    for phase in range(state["phase"], len(PHASES)):
+        sequence, validation_data, epochs = fits[phase]
+        history = state["history"][PHASES[phase]]
+        first_epoch = state["epoch"] if phase == state["phase"] else 0
+        if phase == 1 and first_epoch == 0 and config.get("retrain"):
+            model = fresh_model(seed + 1)
+        for epoch in range(first_epoch, epochs):
+            sequence.set_epoch(epoch)
+            keras.utils.set_random_seed(seed * 1000 + phase * 100 + epoch)
+            logs = model.fit(sequence, validation_data=validation_data,
+                             initial_epoch=epoch, epochs=epoch + 1, verbose=0).history
+            for key, values in logs.items():
+                history.setdefault(key, []).extend(float(value) for value in values)
+            next_phase, next_epoch = (phase, epoch + 1) if epoch + 1 < epochs else (phase + 1, 0)
+            state = {"run": run, "phase": next_phase, "epoch": next_epoch,
+                     "history": state["history"]}
+            writer.write(directory, snapshot(model), json.loads(json.dumps(state)))
+
+    results = model.evaluate(**keras_inputs(data["x_test"], data["y_test"], batch_size),
+                             verbose=0)
+    writer.flush()
+    outcome = {
+        "run": run,
+        "history": state["history"]["validation"] or state["history"]["final"],
+        "results": [float(value) for value in results],
+        "final_epochs": config["epochs"],
+        "precision": precision,
+        "peak_rss_mb": peak_rss_mb() if per_run_peak else None,
+        "wall_time": time.perf_counter() - start,
+    }
+    with open(done_path, "w") as f:
+        json.dump(outcome, f)
+    outcome["model"] = model
+    outcome["resumed"] = resumed
+    return outcome
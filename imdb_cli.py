@@ -0,0 +1,252 @@
+# -*- coding: utf-8 -*-
+"""Command-line entry point for the IMDB experiments.
+
+The assignment script runs everything at import time: TensorFlow, the
+dataset download and encoding, every fit and every plot, even to decode a
+single review. Here each task is a subcommand, and a subcommand imports
+only the modules listed for it in `COMMANDS`, so tasks that need no model
+start in a fraction of a second. `decode` and `report` never import
+TensorFlow.
+
+    python imdb_cli.py prepare                     # download + encode once
+    python imdb_cli.py train model_21              # train, publish to models/
+    python imdb_cli.py train model_21 --store experiments.sqlite   # once per config
+    python imdb_cli.py sweep --store experiments.sqlite
+    python imdb_cli.py evaluate                    # latest published model
+    python imdb_cli.py predict "a wonderful film" "dull and far too long"
+    python imdb_cli.py decode 0 1 2 --split test
+    python imdb_cli.py report
+    python imdb_cli.py startup                     # startup times vs budget
+
+`startup` launches every subcommand in a fresh interpreter up to the point
+where its imports are done, and fails if one exceeds its budget (seconds)
+or if a TensorFlow-free command imported TensorFlow.
+"""
+
+import argparse
+import importlib
+import json
+import subprocess
+import sys
+import time
+
+# name: (modules imported before the command runs, startup budget in s, TF-free)
+COMMANDS = {
+    "prepare": (["imdb_cache", "imdb_decode"], 0.5, True),
+    "train": (["tensorflow", "imdb_cache", "imdb_models", "imdb_online", "imdb_registry"],
+              10.0, False),
+    "sweep": (["imdb_models", "imdb_sweep", "imdb_registry"], 0.5, True),
+    "evaluate": (["tensorflow", "imdb_cache", "imdb_online"], 10.0, False),
+    "predict": (["tensorflow", "imdb_decode", "imdb_online", "imdb_serving"], 10.0, False),
+    "decode": (["imdb_decode"], 0.5, True),
+    "report": (["imdb_report", "imdb_registry"], 0.5, True),
+}
+
+
+def _import_for(command):
+    for module in COMMANDS[command][0]:
+        importlib.import_module(module)
+
+
+def prepare(args):
+    import imdb_cache
+    import imdb_decode
+
+    start = time.perf_counter()
+    data = imdb_cache.load_encoded(args.num_words, args.encoding, args.dtype,
+                                   refresh=args.refresh)
+    imdb_decode.load_reverse_lookup()
+    state = "cache hit" if data["cache_hit"] else "encoded"
+    print(f"{args.encoding} {args.dtype} x_train {data['x_train'].shape}: "
+          f"{state} in {time.perf_counter() - start:.1f} s")
+
+
+def train(args):
+    from tensorflow import keras
+
+    import imdb_cache
+    from imdb_models import train_variant, variant_config
+    from imdb_online import publish
+    from imdb_registry import ExperimentStore, run_key
+
+    config = variant_config(args.variant)
+    dtype = "bfloat16" if args.precision == "mixed_bfloat16" else "float32"
+    train_options = {"early_stopping": args.early_stopping, "precision": args.precision}
+    if args.jit:
+        train_options["jit_compile"] = True
+    if args.store:
+        store = ExperimentStore(args.store)
+        data_options = {"num_words": 10000, "encoding": "dense", "dtype": dtype}
+        key = run_key(config, args.seed, data_options, **train_options)
+        record = store.get(key)
+        if record is not None:
+            print(f"{args.variant}: loss {record['test_loss']:.4f}"
+                  f" acc {record['test_accuracy']:.4f}, already in {args.store};"
+                  " not retrained")
+            return
+    data = imdb_cache.load_encoded(dtype=dtype)
+    keras.utils.set_random_seed(args.seed)
+    outcome = train_variant(config, data, **train_options)
+    loss, accuracy = outcome["results"]
+    version = publish(outcome["model"], args.models, variant=args.variant,
+                      accuracy_after=float(accuracy))
+    if args.store:
+        store.put(key, args.variant, config, args.seed, outcome)
+    print(f"{args.variant}: loss {loss:.4f} acc {accuracy:.4f}"
+          f" in {outcome['wall_time']:.1f} s, published as version"
+          f" {version['version']} in {args.models}")
+
+
+def sweep(args):
+    from imdb_models import VARIANTS, variant_config
+    from imdb_registry import ExperimentStore
+    from imdb_sweep import run_sweep
+
+    names = args.variants or list(VARIANTS)
+    train_options = {"early_stopping": args.early_stopping}
+    if args.jit:
+        train_options["jit_compile"] = True
+    outcomes = run_sweep({name: variant_config(name) for name in names}, args.workers,
+                         seed=0, store=ExperimentStore(args.store) if args.store else None,
+                         **train_options)
+    for name in names:
+        loss, accuracy = outcomes[name]["results"][:2]
+        print(f"{name:<22} loss {loss:.4f}  acc {accuracy:.4f}"
+              f"  {outcomes[name]['wall_time']:7.1f} s")
+    print(f"sweep: {outcomes['_total']:.1f} s")
+
+
+def evaluate(args):
+    import imdb_cache
+    from imdb_online import load_latest
+
+    model, version = load_latest(args.models)
+    data = imdb_cache.load_encoded()
+    loss, accuracy = model.evaluate(data["x_test"], data["y_test"], batch_size=512, verbose=0)
+    print(f"version {version['version']} ({version.get('variant')}): "
+          f"test loss {loss:.4f} acc {accuracy:.4f}")
+
+
+def predict(args):
+    from imdb_decode import load_word_index
+    from imdb_online import load_latest
+    from imdb_serving import ReviewClassifier, tokenize
+
+    reviews = list(args.reviews)
+    if args.file:
+        with open(args.file, encoding="utf-8") as f:
+            reviews.extend(line.strip() for line in f if line.strip())
+    model, _ = load_latest(args.models)
+    word_index = load_word_index()
+    classifier = ReviewClassifier(model, word_index)
+    scores = classifier.predict_batch([tokenize(review, word_index) for review in reviews])
+    for review, score in zip(reviews, scores):
+        label = "positive" if score > 0.5 else "negative"
+        print(f"{score:.4f} {label:<8} {review[:60]}")
+
+
+def decode(args):
+    from imdb_decode import Decoder, load_reviews
+
+    sequences, labels = load_reviews(args.split)
+    decoder = Decoder.from_cache()
+    if args.output:
+        decoder.decode_to_file(sequences, args.output)
+        print(f"{len(sequences)} {args.split} reviews -> {args.output}")
+        return
+    for index in args.indices or [0]:
+        review = decoder.decode(sequences[index])
+        print(f"[{args.split} {index}, label {labels[index]}] {review}")
+
+
+def report(args):
+    from imdb_registry import ExperimentStore
+    from imdb_report import build_report
+
+    records = ExperimentStore(args.store).latest_by_name()
+    if not records:
+        sys.exit(f"no runs in {args.store}")
+    print(build_report(records, args.output, args.workers))
+
+
+def startup(args):
+    failed = False
+    for command, (_, budget, tf_free) in COMMANDS.items():
+        start = time.perf_counter()
+        output = subprocess.run([sys.executable, __file__, "--startup-only", command],
+                                check=True, capture_output=True, text=True).stdout
+        seconds = time.perf_counter() - start
+        imported_tf = json.loads(output.strip().splitlines()[-1])["tensorflow"]
+        ok = seconds <= budget and not (tf_free and imported_tf)
+        failed = failed or not ok
+        print(f"{command:<9} {seconds:6.2f} s  budget {budget:5.1f} s"
+              f"  tensorflow {'yes' if imported_tf else 'no ':<3}  {'ok' if ok else 'FAIL'}")
+    if failed:
+        sys.exit(1)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="imdb_cli.py", description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    p = commands.add_parser("prepare", help="download and encode the dataset into the cache")
+    p.add_argument("--num-words", type=int, default=10000)
+    p.add_argument("--encoding", choices=["dense", "packed"], default="dense")
+    p.add_argument("--dtype", default="float32")
+    p.add_argument("--refresh", action="store_true")
+    p.set_defaults(run=prepare)
+
+    p = commands.add_parser("train", help="train one variant and publish it")
+    p.add_argument("variant")
+    p.add_argument("--models", default="models")
+    p.add_argument("--store")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--precision", default="float32")
+    p.add_argument("--early-stopping", action="store_true")
+    p.add_argument("--jit", action="store_true")
+    p.set_defaults(run=train)
+
+    p = commands.add_parser("sweep", help="train variants in parallel workers")
+    p.add_argument("variants", nargs="*")
+    p.add_argument("--workers", type=int)
+    p.add_argument("--store")
+    p.add_argument("--early-stopping", action="store_true")
+    p.add_argument("--jit", action="store_true")
+    p.set_defaults(run=sweep)
+
+    p = commands.add_parser("evaluate", help="test the latest published model")
+    p.add_argument("--models", default="models")
+    p.set_defaults(run=evaluate)
+
+    p = commands.add_parser("predict", help="score review texts with the latest model")
+    p.add_argument("reviews", nargs="*")
+    p.add_argument("--file", help="one review per line")
+    p.add_argument("--models", default="models")
+    p.set_defaults(run=predict)
+
+    p = commands.add_parser("decode", help="print reviews as text")
+    p.add_argument("indices", nargs="*", type=int)
+    p.add_argument("--split", choices=["train", "test"], default="train")
+    p.add_argument("--output", help="decode the whole split into this file")
+    p.set_defaults(run=decode)
+
+    p = commands.add_parser("report", help="render stored runs into an HTML report")
+    p.add_argument("--store", default="experiments.sqlite")
+    p.add_argument("--output", default="report")
+    p.add_argument("--workers", type=int)
+    p.set_defaults(run=report)
+
+    p = commands.add_parser("startup", help="check every subcommand's startup time")
+    p.set_defaults(run=startup)
+    return parser
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--startup-only"]:
+        _import_for(sys.argv[2])
+        print(json.dumps({"tensorflow": "tensorflow" in sys.modules}))
+        sys.exit()
+    args = build_parser().parse_args()
+    if args.command in COMMANDS:
+        _import_for(args.command)
+    args.run(args)
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""K-fold cross-validation of any model variant, with folds in parallel.
+
+The script selects models on one fixed hold-out split (`x_train[:10000]`),
+so a single run decides conclusions like "units have no effect". Here the
+25k training reviews are split into `k` folds; every fold trains a fresh
+model on the other `k - 1` folds for the variant's final epoch count and
+scores it on the held-out fold. The folds run concurrently in the pinned
+worker pool from `imdb_sweep`, which memory-maps the encoded matrix once
+instead of sending each worker a copy. Batches are gathered from the
+shared matrix by index, so no fold copies its training split either.
+
+    python imdb_cv.py model_21 model_tanh --folds 5
+"""
+
+import statistics
+import time
+
+import numpy as np
+from tensorflow import keras
+
+from imdb_encoding import IndexBatches
+from imdb_models import VARIANTS, build_model, variant_config
+from imdb_sweep import available_cores, make_pool, worker_data
+
+
+def fold_indices(num_samples, k, seed=0):
+    """`k` disjoint index arrays covering a shuffled `range(num_samples)`."""
+    order = np.random.default_rng(seed).permutation(num_samples)
+    return np.array_split(order, k)
+
+
+def _run_fold(config, fold, k, seed, batch_size=512):
+    data = worker_data()
+    folds = fold_indices(len(data["x_train"]), k, seed)
+    held_out = folds[fold]
+    train = np.concatenate([indices for i, indices in enumerate(folds) if i != fold])
+    keras.utils.set_random_seed(seed + fold)
+    model = build_model(config)
+    start = time.perf_counter()
+    model.fit(IndexBatches(data["x_train"], data["y_train"], train, batch_size,
+                             shuffle=True, seed=seed + fold),
+              epochs=config["epochs"], verbose=0)
+    train_time = time.perf_counter() - start
+    loss, accuracy = model.evaluate(
+        IndexBatches(data["x_train"], data["y_train"], held_out, batch_size), verbose=0)
+    return {"fold": fold, "loss": loss, "accuracy": accuracy,
+            "examples": config["epochs"] * len(train), "train_time": train_time}
+
+
+def cross_validate(config, k=5, num_workers=None, seed=0, num_words=10000):
+    """Train and score `k` folds of `config`, `num_workers` at a time.
+
+    Returns the per-fold results, mean and standard deviation of loss and
+    accuracy, the wall time and the overall training throughput.
+    """
+    data_options = {"num_words": num_words, "encoding": "dense", "dtype": "float32"}
+    num_workers = num_workers or min(k, len(available_cores()))
+    start = time.perf_counter()
+    with make_pool(num_workers, data_options) as pool:
+        folds = list(pool.map(_run_fold, [config] * k, range(k), [k] * k, [seed] * k))
+    wall_time = time.perf_counter() - start
+    report = {"folds": folds, "wall_time": wall_time,
+              "throughput": sum(fold["examples"] for fold in folds) / wall_time}
+    for metric in ["loss", "accuracy"]:
+        values = [fold[metric] for fold in folds]
+        report[metric] = (statistics.mean(values), statistics.stdev(values) if k > 1 else 0.0)
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="K-fold cross-validation of model variants.")
+    parser.add_argument("variants", nargs="*", default=list(VARIANTS))
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--compare-serial", action="store_true")
+    args = parser.parse_args()
+
+    for name in args.variants:
+        config = variant_config(name)
+        report = cross_validate(config, args.folds, args.workers)
+        loss, accuracy = report["loss"], report["accuracy"]
+        print(f"{name:<22} loss {loss[0]:.4f} ± {loss[1]:.4f}"
+              f"  acc {accuracy[0]:.4f} ± {accuracy[1]:.4f}"
+              f"  {report['wall_time']:6.1f} s  {report['throughput']:7.0f} ex/s")
+        if args.compare_serial:
+            serial = cross_validate(config, args.folds, num_workers=1)
+            print(f"{'':<22} serial {serial['wall_time']:6.1f} s"
+                  f"  {serial['throughput']:7.0f} ex/s"
+                  f"  (parallel speedup {serial['wall_time'] / report['wall_time']:.1f}x)")
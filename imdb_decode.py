@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""Vectorized decoding of IMDB reviews back to text.
+
+The script decodes one review with a dict lookup per word. Here the reverse
+word index is a dense NumPy array (word index + 3 -> word, "?" for the
+reserved indices 0-2 and unknown words), built once and cached on disk next
+to the encoded tensors. A batch of reviews is then decoded with a single
+`take` over all of their word indices and one join per review.
+
+    train_data, train_labels = load_reviews("train")   # no TensorFlow needed
+    decoder = Decoder.from_cache()
+    decoder.decode(train_data[0])
+    decoder.decode_batch(train_data[:100])
+    decoder.decode_to_file(train_data, "train_reviews.txt")
+"""
+
+import functools
+import json
+import os
+import pickle
+import zipfile
+
+import numpy as np
+
+import imdb_cache
+from imdb_encoding import INDEX_FROM, OOV_CHAR, START_CHAR, flatten_sequences
+
+UNKNOWN = "?"
+
+
+def build_reverse_lookup(word_index):
+    """Dense index -> word array with the offset-3 reserved indices as "?".
+
+    The last entry is also "?", so out-of-range indices clip onto it.
+    """
+    size = max(word_index.values()) + INDEX_FROM + 2
+    lookup = np.full(size, UNKNOWN, dtype=object)
+    words = np.array(list(word_index.keys()), dtype=object)
+    lookup[np.fromiter(word_index.values(), dtype=np.int64) + INDEX_FROM] = words
+    return lookup
+
+
+def load_word_index():
+    """The IMDB word index, read straight from the Keras dataset file if present."""
+    path = os.path.join(imdb_cache.keras_datasets_dir(), "imdb_word_index.json")
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    from tensorflow.keras.datasets import imdb
+    return imdb.get_word_index()
+
+
+class _ArrayUnpickler(pickle.Unpickler):
+    """Unpickles only what the ragged object arrays of `imdb.npz` contain."""
+
+    ALLOWED = {("numpy", "ndarray"), ("numpy", "dtype"),
+               ("numpy.core.multiarray", "_reconstruct"),
+               ("numpy._core.multiarray", "_reconstruct")}
+
+    def find_class(self, module, name):
+        if (module, name) not in self.ALLOWED:
+            raise pickle.UnpicklingError(f"refusing to load {module}.{name} from imdb.npz")
+        return super().find_class(module, name)
+
+
+def _load_npz(path):
+    arrays = {}
+    with zipfile.ZipFile(path) as archive:
+        for member in archive.namelist():
+            with archive.open(member) as fp:
+                version = np.lib.format.read_magic(fp)
+                read_header = (np.lib.format.read_array_header_1_0 if version == (1, 0)
+                               else np.lib.format.read_array_header_2_0)
+                if read_header(fp)[2].hasobject:
+                    array = _ArrayUnpickler(fp).load()
+                else:
+                    fp.seek(0)
+                    array = np.lib.format.read_array(fp)
+            arrays[member[:-len(".npy")]] = array
+    return arrays
+
+
+def load_reviews(split="train", num_words=10000):
+    """`imdb.load_data(num_words=...)` word indices and labels of one split.
+
+    Reads the dataset file Keras downloaded (and hash-checked) directly,
+    with the same restricted unpickling as Keras, and applies the same
+    shuffle (seed 113), start/offset and out-of-vocabulary conventions, so
+    review `i` here is `train_data[i]` of the script, without importing
+    TensorFlow.
+    """
+    path = os.path.join(imdb_cache.keras_datasets_dir(), "imdb.npz")
+    if not os.path.exists(path):
+        from tensorflow.keras.datasets import imdb
+        (train_data, train_labels), (test_data, test_labels) = imdb.load_data(
+            num_words=num_words)
+        return (train_data, train_labels) if split == "train" else (test_data, test_labels)
+    f = _load_npz(path)
+    splits = {"train": (f["x_train"], f["y_train"]), "test": (f["x_test"], f["y_test"])}
+    rng = np.random.RandomState(113)
+    for name in ["train", "test"]:
+        order = np.arange(len(splits[name][0]))
+        rng.shuffle(order)
+        if name == split:
+            sequences, labels = splits[name][0][order], splits[name][1][order]
+    reviews = []
+    for sequence in sequences:
+        sequence = np.asarray(sequence, dtype=np.int64) + INDEX_FROM
+        sequence[sequence >= num_words] = OOV_CHAR
+        reviews.append([START_CHAR] + sequence.tolist())
+    return reviews, labels
+
+
+@functools.lru_cache(maxsize=None)
+def load_reverse_lookup(cache_dir=None):
+    """Reverse lookup array, rebuilt only when the Keras word index changes."""
+    cache_dir = cache_dir or imdb_cache.CACHE_DIR
+    path = os.path.join(cache_dir, "reverse_word_index.npy")
+    meta_path = os.path.join(cache_dir, "reverse_word_index.json")
+    fingerprint = imdb_cache.source_fingerprint()["imdb_word_index.json"]
+    try:
+        with open(meta_path) as f:
+            fresh = fingerprint is not None and json.load(f) == fingerprint
+    except (FileNotFoundError, ValueError):
+        fresh = False
+    if fresh:
+        return np.load(path).astype(object)
+    lookup = build_reverse_lookup(load_word_index())
+    os.makedirs(cache_dir, exist_ok=True)
+    np.save(path, lookup.astype(str))
+    with open(meta_path, "w") as f:
+        json.dump(imdb_cache.source_fingerprint()["imdb_word_index.json"], f)
+    return lookup
+
+
+class Decoder:
+
+    def __init__(self, lookup):
+        self.lookup = lookup
+
+    @classmethod
+    def from_word_index(cls, word_index):
+        return cls(build_reverse_lookup(word_index))
+
+    @classmethod
+    def from_cache(cls, cache_dir=None):
+        return cls(load_reverse_lookup(cache_dir))
+
+    def decode(self, sequence):
+        return self.decode_batch([sequence])[0]
+
+    def decode_batch(self, sequences):
+        indices, offsets = flatten_sequences(sequences)
+        words = self.lookup.take(indices, mode="clip").tolist()
+        return [" ".join(words[start:end]) for start, end in zip(offsets[:-1], offsets[1:])]
+
+    def decode_to_file(self, sequences, path, batch_size=1000):
+        """Write one decoded review per line, `batch_size` reviews at a time."""
+        with open(path, "w", encoding="utf-8") as f:
+            for start in range(0, len(sequences), batch_size):
+                for review in self.decode_batch(sequences[start:start + batch_size]):
+                    f.write(review)
+                    f.write("\n")
@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+"""Synchronous data-parallel training over local worker processes.
+
+One TF process cannot keep all cores busy with these small MLPs, so
+`train_data_parallel` launches `num_workers` processes, each pinned to its
+own cores, that together train one model:
+
+* every worker builds the model from the same seed, so all replicas start
+  from identical weights, but gives its Dropout layers their own seeds, so
+  the workers do not share dropout masks;
+* each worker reads only its contiguous shard of the memory-mapped
+  training set from `imdb_cache` and draws `batch_size / num_workers`
+  examples of every global batch from it (`batch_size` must be a
+  multiple of `num_workers`, so the global batch stays `batch_size`);
+* after each step the gradients are averaged with an all-reduce over a
+  shared-memory buffer (reduce-scatter, then every worker reads the whole
+  result), and every replica applies the same Adam update.
+
+The replicas therefore stay bit-identical (every worker reports a digest
+of its final weights, and a mismatch is an error), and a step is
+equivalent to a step on the whole global batch. This replaces a `MultiWorkerMirroredStrategy`
+cluster on localhost, which Keras 3 does not support reliably, with the same
+all-reduce without the gRPC round trips.
+
+    python imdb_distributed.py model_23 --workers 1 2 4 8
+"""
+
+import hashlib
+import math
+import multiprocessing
+import os
+import queue
+import time
+
+import numpy as np
+
+import imdb_cache
+from imdb_encoding import keras_inputs
+from imdb_sweep import core_subsets
+
+
+def num_parameters(config, num_words=10000):
+    sizes = [num_words, *config["units"], 1]
+    return sum(n_in * n_out + n_out for n_in, n_out in zip(sizes, sizes[1:]))
+
+
+def shard(num_samples, num_workers, rank):
+    """The contiguous slice of the training set read by worker `rank`."""
+    bounds = np.linspace(0, num_samples, num_workers + 1).astype(int)
+    return slice(bounds[rank], bounds[rank + 1])
+
+
+class SharedAllReduce:
+    """Sums one float32 vector per worker through shared memory."""
+
+    def __init__(self, context, num_workers, size):
+        self.num_workers = num_workers
+        self.size = size
+        self.send = context.RawArray("f", num_workers * size)
+        self.result = context.RawArray("f", size)
+        self.barrier = context.Barrier(num_workers)
+
+    def __call__(self, rank, vector):
+        send = np.frombuffer(self.send, dtype=np.float32).reshape(self.num_workers, self.size)
+        result = np.frombuffer(self.result, dtype=np.float32)
+        send[rank] = vector
+        self.barrier.wait()
+        # Reduce-scatter: each worker sums its own segment of all vectors.
+        segment = slice(*np.linspace(0, self.size, self.num_workers + 1).astype(int)[rank:rank + 2])
+        result[segment] = send[:, segment].sum(axis=0)
+        self.barrier.wait()
+        return result.copy()
+
+
+def _worker(rank, num_workers, cores, config, options, reduce, results):
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+    import tensorflow as tf
+    from tensorflow import keras
+    tf.config.threading.set_intra_op_parallelism_threads(len(cores))
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+    from imdb_models import build_model
+
+    seed, batch_size = options["seed"], options["batch_size"]
+    data = imdb_cache.load_encoded(num_words=options["num_words"])
+    rows = shard(len(data["x_train"]), num_workers, rank)
+    x_shard, y_shard = data["x_train"][rows], data["y_train"][rows]
+    local_batch = batch_size // num_workers
+    steps = math.ceil(len(data["x_train"]) / batch_size)
+
+    keras.utils.set_random_seed(seed)
+    model = build_model(config, num_words=options["num_words"])
+    model.build((None, options["num_words"]))
+    # Each worker draws its own dropout masks, as one model would over the
+    # whole global batch. The seed state is not part of `get_weights`.
+    rng = np.random.default_rng([seed, rank])
+    for layer in model.layers:
+        if isinstance(layer, keras.layers.Dropout):
+            layer.seed_generator.state.assign([int(rng.integers(2**31)), 0])
+    variables = model.trainable_variables
+    model.optimizer.build(variables)
+    loss_fn = keras.losses.get(config["loss"])
+
+    @tf.function
+    def gradient_step(x, y):
+        count = tf.cast(tf.shape(x)[0], tf.float32)
+        with tf.GradientTape() as tape:
+            predictions = model(x, training=True)
+            per_example = loss_fn(y, predictions)
+            loss = tf.reduce_mean(per_example)
+            if model.losses:
+                loss += tf.add_n(model.losses)
+        gradients = tape.gradient(loss, variables)
+        correct = tf.reduce_sum(tf.cast(tf.equal(predictions > 0.5, y > 0.5), tf.float32))
+        # Weighted by the local batch size, so the sum over workers divided
+        # by the total count is the mean over the global batch (and, for the
+        # loss, includes the L2 penalty as Keras' reported loss does).
+        return tf.concat([tf.reshape(g, [-1]) * count for g in gradients]
+                         + [[count, loss * count, correct]], axis=0)
+
+    @tf.function
+    def apply_step(flat):
+        gradients = tf.split(flat, [int(np.prod(v.shape)) for v in variables])
+        model.optimizer.apply_gradients(
+            [(tf.reshape(g, v.shape), v) for g, v in zip(gradients, variables)])
+
+    history = {"loss": [], "accuracy": []}
+    train_start = time.perf_counter()
+    for epoch in range(options["epochs"]):
+        order = np.random.default_rng([seed, epoch, rank]).permutation(len(x_shard))
+        totals = np.zeros(3)
+        for step in range(steps):
+            batch = np.sort(order[step * local_batch:(step + 1) * local_batch])
+            if len(batch):
+                vector = gradient_step(np.asarray(x_shard[batch]),
+                                       np.asarray(y_shard[batch]).reshape(-1, 1)).numpy()
+            else:
+                vector = np.zeros(reduce.size, dtype=np.float32)
+            summed = reduce(rank, vector)
+            count = summed[-3]
+            apply_step(summed[:-3] / count)
+            totals += summed[-3:]
+        history["loss"].append(float(totals[1] / totals[0]))
+        history["accuracy"].append(float(totals[2] / totals[0]))
+    train_time = time.perf_counter() - train_start
+    weights = model.get_weights()
+    digest = hashlib.sha256(b"".join(w.tobytes() for w in weights)).hexdigest()
+    if rank == 0:
+        results.put({"rank": rank, "digest": digest, "weights": weights,
+                     "history": history, "train_time": train_time})
+    else:
+        results.put({"rank": rank, "digest": digest})
+
+
+def train_data_parallel(config, num_workers=2, epochs=None, batch_size=512, seed=0,
+                        num_words=10000, cores=None):
+    """Fit `config` on `x_train` with `num_workers` data-parallel processes.
+
+    Trains for `config["epochs"]` (or `epochs`) and returns the single
+    trained model, its per-epoch history, the test results, the wall time,
+    the training throughput and the weight digest of every replica.
+    """
+    if batch_size % num_workers:
+        raise ValueError(f"batch_size {batch_size} is not a multiple of "
+                         f"num_workers {num_workers}")
+    imdb_cache.load_encoded(num_words=num_words)  # build the cache before the workers read it
+    context = multiprocessing.get_context("spawn")
+    options = {"seed": seed, "batch_size": batch_size, "num_words": num_words,
+               "epochs": epochs or config["epochs"]}
+    reduce = SharedAllReduce(context, num_workers, num_parameters(config, num_words) + 3)
+    results = context.Queue()
+    subsets = core_subsets(num_workers, cores)
+    start = time.perf_counter()
+    workers = [context.Process(target=_worker,
+                               args=(rank, num_workers, subsets[rank % len(subsets)], config,
+                                     options, reduce, results))
+               for rank in range(num_workers)]
+    for worker in workers:
+        worker.start()
+    reports = {}
+    try:
+        while len(reports) < num_workers:
+            try:
+                report = results.get(timeout=1)
+                reports[report["rank"]] = report
+            except queue.Empty:
+                if any(worker.exitcode not in (None, 0) for worker in workers):
+                    raise RuntimeError("a data-parallel worker failed")
+    except BaseException:
+        reduce.barrier.abort()
+        for worker in workers:
+            worker.terminate()
+        raise
+    finally:
+        for worker in workers:
+            worker.join()
+    wall_time = time.perf_counter() - start
+    digests = [reports[rank]["digest"] for rank in range(num_workers)]
+    if len(set(digests)) > 1:
+        raise RuntimeError(f"data-parallel replicas diverged: {digests}")
+    outcome = reports[0]
+
+    from imdb_models import build_model
+    data = imdb_cache.load_encoded(num_words=num_words)
+    model = build_model(config, num_words=num_words)
+    model.build((None, num_words))
+    model.set_weights(outcome["weights"])
+    results = model.evaluate(**keras_inputs(data["x_test"], data["y_test"], batch_size),
+                             verbose=0)
+    return {
+        "model": model,
+        "history": outcome["history"],
+        "results": results,
+        "num_workers": num_workers,
+        "wall_time": wall_time,
+        "throughput": options["epochs"] * len(data["x_train"]) / outcome["train_time"],
+        "replica_digests": digests,
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from imdb_models import variant_config
+
+    parser = argparse.ArgumentParser(description="Data-parallel training scaling benchmark.")
+    parser.add_argument("variant", nargs="?", default="model_23")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--batch-size", type=int, default=512)
+    args = parser.parse_args()
+
+    config = variant_config(args.variant)
+    base = None
+    for num_workers in args.workers:
+        outcome = train_data_parallel(config, num_workers, batch_size=args.batch_size)
+        base = base or outcome["throughput"]
+        loss, accuracy = outcome["results"]
+        print(f"{num_workers} workers: {outcome['throughput']:8.0f} ex/s"
+              f" (speedup {outcome['throughput'] / base:4.1f}x)"
+              f"  wall {outcome['wall_time']:6.1f} s  test loss {loss:.4f} acc {accuracy:.4f}")
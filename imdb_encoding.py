@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+"""Memory-light multi-hot encoding for the IMDB reviews.
+
+`vectorize_sequences` in the assignment script builds a dense float64
+matrix, which is about 2 GB for each of the train and test splits. Here the
+reviews are kept bit-packed instead (one bit per word, 1250 bytes per review
+at 10000 words) and expanded to float32 one mini-batch at a time, only when
+`model.fit`, `evaluate` or `predict` asks for that batch.
+
+    x_train = pack_sequences(train_data)
+    x_val, partial_x_train = x_train[:10000], x_train[10000:]
+    model.fit(MultiHotSequence(partial_x_train, partial_y_train, shuffle=True),
+              epochs=20,
+              validation_data=MultiHotSequence(x_val, y_val))
+"""
+
+import itertools
+import math
+
+import numpy as np
+
+# Index conventions of `imdb.load_data`: every review starts with
+# START_CHAR, words outside the vocabulary become OOV_CHAR, and word index
+# `i` of `imdb.get_word_index()` is stored as `i + INDEX_FROM`.
+START_CHAR = 1
+OOV_CHAR = 2
+INDEX_FROM = 3
+
+
+class PackedMultiHot:
+    """Multi-hot rows stored as packed bits.
+
+    Slicing keeps the rows packed, so `x_train[:10000]` costs no extra
+    memory. Indexing with an int or an index array returns the selected
+    rows as a dense array of `dtype`. Converting the whole matrix with
+    `np.asarray` is refused, so it is never densified by accident; use
+    `unpack()` to do that on purpose, or `keras_inputs` to feed Keras.
+    """
+
+    def __init__(self, bits, dimension, dtype="float32"):
+        self.bits = bits
+        self.dimension = dimension
+        self.dtype = np.dtype(dtype)
+
+    @property
+    def shape(self):
+        return (len(self.bits), self.dimension)
+
+    @property
+    def nbytes(self):
+        return self.bits.nbytes
+
+    def __len__(self):
+        return len(self.bits)
+
+    def rows(self, index):
+        """Return the selected rows, still packed."""
+        if isinstance(index, (int, np.integer)):
+            index = slice(index, index + 1)
+        return PackedMultiHot(self.bits[index], self.dimension, self.dtype)
+
+    def unpack(self, index=slice(None)):
+        bits = self.bits[index]
+        return np.unpackbits(bits, axis=-1, count=self.dimension).astype(self.dtype)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.rows(index)
+        return self.unpack(index)
+
+    def __array__(self, dtype=None, copy=None):
+        raise TypeError("PackedMultiHot would be densified; call unpack() or "
+                        "pass it through keras_inputs()")
+
+
+def flatten_sequences(sequences):
+    """Flatten ragged index sequences into one array plus row offsets.
+
+    Row `i` owns `indices[offsets[i]:offsets[i + 1]]`.
+    """
+    lengths = np.fromiter((len(sequence) for sequence in sequences),
+                          dtype=np.int64, count=len(sequences))
+    offsets = np.zeros(len(sequences) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    indices = np.fromiter(itertools.chain.from_iterable(sequences),
+                          dtype=np.int64, count=offsets[-1])
+    return indices, offsets
+
+
+def vectorize_sequences(sequences, dimension=10000, dtype="float64"):
+    """Multi-hot encode index sequences in one fancy-index pass.
+
+    Same result as the nested loop in the assignment script, without the
+    per-token Python assignments.
+    """
+    indices, offsets = flatten_sequences(sequences)
+    rows = np.repeat(np.arange(len(sequences)), np.diff(offsets))
+    results = np.zeros((len(sequences), dimension), dtype=dtype)
+    results[rows, indices] = 1
+    return results
+
+
+def pad_token_sets(sequences, width=None, pad=-1):
+    """Distinct word indices of each review, as rows padded with `pad`.
+
+    This is the input of `imdb_layers.TokenBagDense`; `width` defaults to
+    the largest number of distinct words in any review.
+    """
+    token_sets = [np.unique(np.asarray(sequence, dtype=np.int32)) for sequence in sequences]
+    if width is None:
+        width = max((len(tokens) for tokens in token_sets), default=0)
+    results = np.full((len(sequences), width), pad, dtype=np.int32)
+    for i, tokens in enumerate(token_sets):
+        results[i, :len(tokens)] = tokens[:width]
+    return results
+
+
+def pack_sequences(sequences, dimension=10000, dtype="float32", chunk_size=1024):
+    """Encode index sequences as bit-packed multi-hot rows.
+
+    Rows are encoded `chunk_size` at a time, so the dense matrix never
+    exists in full.
+    """
+    bits = np.zeros((len(sequences), (dimension + 7) // 8), dtype=np.uint8)
+    for start in range(0, len(sequences), chunk_size):
+        chunk = vectorize_sequences(sequences[start:start + chunk_size],
+                                    dimension, dtype=bool)
+        bits[start:start + len(chunk)] = np.packbits(chunk, axis=1)
+    return PackedMultiHot(bits, dimension, dtype)
+
+
+def _define_sequences():
+    from tensorflow import keras
+
+    class IndexBatches(keras.utils.Sequence):
+        """Batches of `x[indices]` (and `y[indices]`), gathered one batch at a time.
+
+        `indices` defaults to every row. The indices of a batch are sorted
+        before the gather, so memory-mapped and packed rows are read in
+        order; packed rows come out unpacked. With `shuffle=True` the order
+        is reshuffled after every epoch, the same way `fit` shuffles plain
+        NumPy arrays. Without labels the batches carry only inputs, which is
+        what `predict` expects.
+        """
+
+        def __init__(self, x, y=None, indices=None, batch_size=512, shuffle=False,
+                     seed=None):
+            super().__init__()
+            self.x = x
+            self.y = None if y is None else np.asarray(y)
+            self.indices = np.arange(len(x)) if indices is None else np.sort(indices)
+            self.batch_size = batch_size
+            self.shuffle = shuffle
+            self.rng = np.random.default_rng(seed)
+            self.order = self.indices.copy()
+            if shuffle:
+                self.rng.shuffle(self.order)
+
+        def __len__(self):
+            return math.ceil(len(self.indices) / self.batch_size)
+
+        def __getitem__(self, index):
+            batch = np.sort(self.order[index * self.batch_size:(index + 1) * self.batch_size])
+            inputs = np.asarray(self.x[batch])
+            if self.y is None:
+                return inputs
+            return inputs, self.y[batch]
+
+        def on_epoch_end(self):
+            if self.shuffle:
+                self.rng.shuffle(self.order)
+
+    class MultiHotSequence(IndexBatches):
+        """Feeds packed rows to Keras as dense batches (all rows, in order or shuffled)."""
+
+        def __init__(self, x, y=None, batch_size=512, shuffle=False, seed=None):
+            super().__init__(x, y, None, batch_size, shuffle, seed)
+
+    return {"IndexBatches": IndexBatches, "MultiHotSequence": MultiHotSequence}
+
+
+def _sequence_class(name):
+    if name not in globals():
+        globals().update(_define_sequences())
+    return globals()[name]
+
+
+def __getattr__(name):
+    # Keras is imported on first use of `IndexBatches` or `MultiHotSequence`,
+    # so the encoders themselves (and `imdb_decode`, `imdb_features`) load
+    # without TensorFlow.
+    if name in ("IndexBatches", "MultiHotSequence"):
+        return _sequence_class(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def keras_inputs(x, y=None, batch_size=512, shuffle=False):
+    """Input arguments of `fit`/`evaluate`/`predict` for dense or packed rows.
+
+    Arrays pass through as `x`, `y` and `batch_size`. `PackedMultiHot` rows
+    are wrapped in a `MultiHotSequence`, so they are unpacked one batch at
+    a time. Its shuffle seed is drawn from NumPy's global generator, which
+    `keras.utils.set_random_seed` seeds.
+    """
+    if isinstance(x, PackedMultiHot):
+        seed = int(np.random.randint(2**31)) if shuffle else None
+        return {"x": _sequence_class("MultiHotSequence")(x, y, batch_size, shuffle, seed)}
+    inputs = {"x": x, "batch_size": batch_size}
+    if y is not None:
+        inputs["y"] = y
+    return inputs
+
+
+def validation_inputs(x, y, batch_size=512):
+    """`validation_data` for `fit`, keeping packed rows packed."""
+    if isinstance(x, PackedMultiHot):
+        return keras_inputs(x, y, batch_size)["x"]
+    return (x, y)
+
+
+if __name__ == "__main__":
+    import resource
+
+    from tensorflow import keras
+    from tensorflow.keras.datasets import imdb
+
+    MultiHotSequence = _sequence_class("MultiHotSequence")
+
+    (train_data, train_labels), (test_data, test_labels) = imdb.load_data(
+        num_words=10000)
+    x_train = pack_sequences(train_data)
+    x_test = pack_sequences(test_data)
+    y_train = np.asarray(train_labels).astype("float32")
+    y_test = np.asarray(test_labels).astype("float32")
+    dense_bytes = len(train_data) * 10000 * 8
+    print(f"dense float64 x_train: {dense_bytes / 2**20:.0f} MiB")
+    print(f"packed x_train: {x_train.nbytes / 2**20:.1f} MiB")
+
+    from tensorflow.keras import layers
+    model = keras.Sequential([
+        layers.Dense(16, activation="relu"),
+        layers.Dense(16, activation="relu"),
+        layers.Dense(1, activation="sigmoid")
+    ])
+    model.compile(optimizer="adam",
+                  loss="binary_crossentropy",
+                  metrics=["accuracy"])
+    model.fit(MultiHotSequence(x_train, y_train, shuffle=True), epochs=4)
+    print(model.evaluate(MultiHotSequence(x_test, y_test)))
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"peak RSS: {peak / 2**10:.0f} MiB")
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""Configurable vocabulary size: feature selection and feature hashing.
+
+The script hard-codes `num_words=10000`, so the input width is tied to the
+vocabulary. A `FeatureMap` maps every word index to one of `num_features`
+input columns (or drops it), chosen in one of three ways:
+
+    FeatureMap.by_document_frequency(train_data, 5000)   # the 5000 most common words
+    FeatureMap.by_chi2(train_data, train_labels, 5000)   # the 5000 most label-dependent
+    FeatureMap.hashed(num_words, 2048)                   # every word, hashed into 2048 buckets
+
+The same map drives the encoder (`encode`), the width of the first Dense
+layer (`num_features`, e.g. `build_model(..., num_words=fmap.num_features)`)
+and decoding (`restrict` turns dropped words into the out-of-vocabulary
+index, which `imdb_decode` shows as "?").
+
+Running the module sweeps 1k/2k/5k/10k/20k features and charts accuracy
+against training throughput and input memory.
+"""
+
+import sys
+import time
+
+import numpy as np
+
+from imdb_encoding import OOV_CHAR, flatten_sequences
+
+
+def document_frequency(sequences, num_words):
+    """Number of reviews each word index occurs in."""
+    indices, offsets = flatten_sequences(sequences)
+    rows = np.repeat(np.arange(len(sequences)), np.diff(offsets))
+    pairs = np.unique(rows * num_words + indices)
+    return np.bincount(pairs % num_words, minlength=num_words)
+
+
+class FeatureMap:
+
+    def __init__(self, mapping, num_features, method):
+        # mapping[word index] -> input column, or -1 if the word is dropped.
+        self.mapping = mapping
+        self.num_features = num_features
+        self.method = method
+
+    @classmethod
+    def _top(cls, scores, num_features, method):
+        keep = np.argsort(-scores, kind="stable")[:num_features]
+        keep = keep[scores[keep] > 0]
+        mapping = np.full(len(scores), -1, dtype=np.int64)
+        mapping[np.sort(keep)] = np.arange(len(keep))
+        return cls(mapping, len(keep), method)
+
+    @classmethod
+    def by_document_frequency(cls, sequences, num_features, num_words=None):
+        num_words = num_words or int(max(max(s) for s in sequences)) + 1
+        return cls._top(document_frequency(sequences, num_words).astype(float),
+                        num_features, "df")
+
+    @classmethod
+    def by_chi2(cls, sequences, labels, num_features, num_words=None):
+        """Keep the words whose presence depends most on the label (chi²)."""
+        num_words = num_words or int(max(max(s) for s in sequences)) + 1
+        labels = np.asarray(labels) > 0.5
+        positive = document_frequency(
+            [s for s, label in zip(sequences, labels) if label], num_words)
+        total = document_frequency(sequences, num_words)
+        n, n_pos = len(sequences), labels.sum()
+        # 2x2 contingency table of (word present, label) per word.
+        observed = np.stack([positive, total - positive,
+                             n_pos - positive, (n - n_pos) - (total - positive)])
+        row = np.stack([total, total, n - total, n - total])
+        column = np.array([n_pos, n - n_pos, n_pos, n - n_pos])[:, None]
+        expected = row * column / n
+        with np.errstate(divide="ignore", invalid="ignore"):
+            chi2 = np.nansum((observed - expected) ** 2 / expected, axis=0)
+        return cls._top(chi2, num_features, "chi2")
+
+    @classmethod
+    def hashed(cls, num_words, num_features, seed=0):
+        """Hash every word index into `num_features` buckets."""
+        indices = np.arange(num_words, dtype=np.uint64)
+        hashed = (indices + np.uint64(seed)) * np.uint64(0x9E3779B97F4A7C15)
+        mapping = ((hashed >> np.uint64(32)) % np.uint64(num_features)).astype(np.int64)
+        return cls(mapping, num_features, "hash")
+
+    def _lookup(self, indices):
+        inside = indices < len(self.mapping)
+        columns = np.full(len(indices), -1, dtype=np.int64)
+        columns[inside] = self.mapping[indices[inside]]
+        return columns
+
+    def encode(self, sequences, dtype="float32"):
+        """Multi-hot encode `sequences` into `num_features` columns."""
+        indices, offsets = flatten_sequences(sequences)
+        rows = np.repeat(np.arange(len(sequences)), np.diff(offsets))
+        columns = self._lookup(indices)
+        kept = columns >= 0
+        results = np.zeros((len(sequences), self.num_features), dtype=dtype)
+        results[rows[kept], columns[kept]] = 1
+        return results
+
+    def restrict(self, sequences):
+        """Original word indices with every dropped word replaced by OOV."""
+        restricted = []
+        for sequence in sequences:
+            sequence = np.asarray(sequence, dtype=np.int64)
+            restricted.append(np.where(self._lookup(sequence) >= 0, sequence, OOV_CHAR))
+        return restricted
+
+
+def _sweep(sizes=(1000, 2000, 5000, 10000, 20000), method="df", chart="feature_sweep.png"):
+    from tensorflow import keras
+    from tensorflow.keras.datasets import imdb
+
+    from imdb_models import build_model, variant_config
+
+    (train_data, train_labels), (test_data, test_labels) = imdb.load_data()
+    y_train = np.asarray(train_labels).astype("float32")
+    y_test = np.asarray(test_labels).astype("float32")
+    num_words = int(max(max(s) for s in train_data)) + 1
+    rows = []
+    for size in sizes:
+        if method == "hash":
+            fmap = FeatureMap.hashed(num_words, size)
+        elif method == "chi2":
+            fmap = FeatureMap.by_chi2(train_data, y_train, size, num_words)
+        else:
+            fmap = FeatureMap.by_document_frequency(train_data, size, num_words)
+        x_train = fmap.encode(train_data)
+        x_test = fmap.encode(test_data)
+        keras.utils.set_random_seed(0)
+        model = build_model(variant_config("model"))
+        start = time.perf_counter()
+        model.fit(x_train, y_train, epochs=4, batch_size=512, verbose=0)
+        throughput = 4 * len(x_train) / (time.perf_counter() - start)
+        _, accuracy = model.evaluate(x_test, y_test, verbose=0)
+        memory = (x_train.nbytes + x_test.nbytes) / 2**20
+        rows.append((size, accuracy, throughput, memory))
+        print(f"{method} {size:>6} features: accuracy {accuracy:.4f}  "
+              f"{throughput:8.0f} ex/s  inputs {memory:6.0f} MiB")
+
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    fig, (ax_speed, ax_memory) = plt.subplots(1, 2, figsize=(10, 4))
+    for ax, column, label in [(ax_speed, 2, "Training throughput (examples/s)"),
+                              (ax_memory, 3, "Input memory (MiB)")]:
+        ax.plot([row[column] for row in rows], [row[1] for row in rows], "bo-")
+        for row in rows:
+            ax.annotate(f"{row[0] // 1000}k", (row[column], row[1]))
+        ax.set_xlabel(label)
+        ax.set_ylabel("Test accuracy")
+    fig.suptitle(f"Accuracy vs cost by number of features ({method})")
+    fig.savefig(chart)
+    return rows
+
+
+if __name__ == "__main__":
+    _sweep(method=sys.argv[1] if len(sys.argv) > 1 else "df")
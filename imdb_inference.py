@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""NumPy-only inference for the trained Dense variants.
+
+The largest variant is 10000 -> 128 -> 128 -> 1, so serving it through
+`model.predict` costs far more in TensorFlow import, tracing and per-call
+overhead than in arithmetic. `export_weights` writes the kernels, biases
+and activations of a trained model to one flat file:
+
+    b"IMDBMLP1" | uint32 header length | JSON header | padding | float32 data
+
+The header lists every layer's activation and the offset and shape of its
+kernel and bias in the data section, which starts on a 64-byte boundary.
+`NumpyClassifier` memory-maps that section, so loading costs no copy, and
+evaluates the layers with float32 BLAS matmuls. `predict_sequences` takes
+word indices instead of multi-hot rows and replaces the first matmul by a
+sum of the kernel rows of each review's distinct words.
+
+    export_weights(model, "model_23.mlp")
+    classifier = NumpyClassifier("model_23.mlp")
+    classifier.predict(x_test[:1])
+    classifier.predict_sequences(test_data[:1])
+
+Running the module exports a trained variant and compares cold start,
+single-request latency, batch throughput and outputs with `model.predict`.
+"""
+
+import json
+import struct
+import sys
+
+import numpy as np
+
+from imdb_encoding import flatten_sequences
+
+MAGIC = b"IMDBMLP1"
+ALIGNMENT = 64
+
+ACTIVATIONS = {
+    "linear": lambda x: x,
+    "relu": lambda x: np.maximum(x, 0, out=x),
+    "tanh": lambda x: np.tanh(x, out=x),
+    # Written through tanh, which cannot overflow the way exp(-x) does.
+    "sigmoid": lambda x: 0.5 * (1 + np.tanh(0.5 * x)),
+}
+
+
+def export_weights(model, path):
+    """Write the Dense layers of `model` to `path`; Dropout is skipped."""
+    layers, arrays, offset = [], [], 0
+    for layer in model.layers:
+        kind = type(layer).__name__
+        if kind == "Dropout":
+            continue
+        if kind != "Dense":
+            raise ValueError(f"Cannot export layer {layer.name!r} of type {kind}")
+        activation = layer.activation.__name__
+        if activation not in ACTIVATIONS:
+            raise ValueError(f"Unsupported activation {activation!r} in {layer.name!r}")
+        entry = {"activation": activation}
+        for name, weights in zip(["kernel", "bias"], layer.get_weights()):
+            weights = np.ascontiguousarray(weights, dtype=np.float32)
+            entry[name] = {"offset": offset, "shape": list(weights.shape)}
+            arrays.append(weights)
+            offset += weights.size
+        layers.append(entry)
+    header = json.dumps({"dtype": "float32", "layers": layers}).encode()
+    start = len(MAGIC) + 4 + len(header)
+    padding = -start % ALIGNMENT
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<I", len(header) + padding))
+        f.write(header + b" " * padding)
+        for weights in arrays:
+            f.write(weights.tobytes())
+    return path
+
+
+def load_weights(path, mmap=True):
+    """The layer list of an exported file, with (memory-mapped) arrays."""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not an exported model")
+        (length,) = struct.unpack("<I", f.read(4))
+        header = json.loads(f.read(length))
+    start = len(MAGIC) + 4 + length
+    if mmap:
+        data = np.memmap(path, dtype=np.float32, mode="r", offset=start)
+    else:
+        data = np.fromfile(path, dtype=np.float32, offset=start)
+    layers = []
+    for entry in header["layers"]:
+        weights = []
+        for name in ["kernel", "bias"]:
+            spec = entry[name]
+            size = int(np.prod(spec["shape"]))
+            weights.append(data[spec["offset"]:spec["offset"] + size].reshape(spec["shape"]))
+        layers.append((weights[0], weights[1], entry["activation"]))
+    return layers
+
+
+class NumpyClassifier:
+    """Forward pass of an exported model with NumPy alone."""
+
+    def __init__(self, path, mmap=True):
+        self.layers = load_weights(path, mmap)
+        self.num_words = self.layers[0][0].shape[0]
+
+    def _forward(self, hidden, layers):
+        for kernel, bias, activation in layers:
+            hidden = ACTIVATIONS[activation](hidden @ kernel + bias)
+        return hidden
+
+    def predict(self, x):
+        """Scores of multi-hot rows `x`, shape (batch, 1) like `model.predict`."""
+        x = np.asarray(x, dtype=np.float32)
+        kernel, bias, activation = self.layers[0]
+        hidden = ACTIVATIONS[activation](x @ kernel + bias)
+        return self._forward(hidden, self.layers[1:])
+
+    def predict_sequences(self, sequences):
+        """Scores of reviews given as word indices, without building multi-hot rows.
+
+        Row `i` of the first layer's pre-activation is the sum of the kernel
+        rows of the distinct words of review `i`. Indices of `num_words` or
+        more, which `imdb.load_data` maps to OOV, are ignored.
+        """
+        indices, offsets = flatten_sequences(sequences)
+        rows = np.repeat(np.arange(len(sequences)), np.diff(offsets))
+        keep = indices < self.num_words
+        pairs = np.unique(rows[keep] * self.num_words + indices[keep])
+        rows, indices = pairs // self.num_words, pairs % self.num_words
+        kernel, bias, activation = self.layers[0]
+        hidden = np.zeros((len(sequences), kernel.shape[1]), dtype=np.float32)
+        if len(indices):
+            starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+            hidden[rows[starts]] = np.add.reduceat(kernel[indices], starts, axis=0)
+        hidden = ACTIVATIONS[activation](hidden + bias)
+        return self._forward(hidden, self.layers[1:])
+
+
+def _cold_start(engine, path, num_words=10000):
+    # One prediction in a fresh interpreter, timed end to end by the parent.
+    x = (np.random.default_rng(0).random((1, num_words)) < 0.01).astype(np.float32)
+    if engine == "numpy":
+        NumpyClassifier(path).predict(x)
+    else:
+        from tensorflow import keras
+        keras.models.load_model(path).predict(x, verbose=0)
+
+
+def _benchmark(name, repeat=200):
+    import os
+    import subprocess
+    import tempfile
+    import time
+
+    from tensorflow import keras
+
+    import imdb_cache
+    from imdb_decode import load_reviews
+    from imdb_models import train_variant, variant_config
+
+    data = imdb_cache.load_encoded()
+    keras.utils.set_random_seed(0)
+    model = train_variant(variant_config(name), data)["model"]
+    directory = tempfile.mkdtemp(prefix="imdb-inference-")
+    keras_path = os.path.join(directory, f"{name}.keras")
+    mlp_path = export_weights(model, os.path.join(directory, f"{name}.mlp"))
+    model.save(keras_path)
+    classifier = NumpyClassifier(mlp_path)
+
+    x_test = np.asarray(data["x_test"])
+    expected = model.predict(x_test, batch_size=512, verbose=0)
+    error = np.abs(classifier.predict(x_test) - expected).max()
+    print(f"{name}: max |numpy - keras| = {error:.2e} over {len(x_test)} reviews")
+
+    for engine, path in [("keras", keras_path), ("numpy", mlp_path)]:
+        start = time.perf_counter()
+        subprocess.run([sys.executable, __file__, "--cold-start", engine, path], check=True,
+                       capture_output=True)
+        print(f"  cold start {engine:>6}: {time.perf_counter() - start:7.3f} s")
+
+    test_data, _ = load_reviews("test")
+    predictors = [("keras", lambda x: model.predict(x, verbose=0), x_test),
+                  ("numpy", classifier.predict, x_test),
+                  ("gather", classifier.predict_sequences, test_data)]
+    for engine, predict, inputs in predictors:
+        predict(inputs[:1])
+        times = []
+        for i in range(repeat):
+            start = time.perf_counter()
+            predict(inputs[i:i + 1])
+            times.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        for i in range(0, len(inputs), 512):
+            predict(inputs[i:i + 512])
+        throughput = len(inputs) / (time.perf_counter() - start)
+        print(f"  {engine:>6}: latency p50 {np.median(times) * 1000:7.3f} ms"
+              f"  p99 {np.percentile(times, 99) * 1000:7.3f} ms  {throughput:8.0f} ex/s")
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--cold-start"]:
+        _cold_start(sys.argv[2], sys.argv[3])
+    else:
+        _benchmark(sys.argv[1] if len(sys.argv) > 1 else "model_23")
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""Sparse-input replacement for the first `Dense` layer.
+
+A review touches only a few hundred of the 10000 input columns, so
+multiplying its multi-hot vector by the kernel is the same as summing the
+kernel rows of the words it contains. `TokenBagDense` computes exactly that
+gather-and-sum from the word indices. It has the same `kernel` and `bias`
+shapes as `Dense`, so weights can be copied between the two.
+
+Inputs are int tensors of distinct word indices per review, padded with -1
+(see `imdb_encoding.pad_token_sets` and `imdb_pipeline.make_token_dataset`),
+or a `tf.RaggedTensor` of distinct word indices.
+"""
+
+import tensorflow as tf
+from tensorflow import keras
+
+PAD = -1
+
+
+class TokenBagDense(keras.layers.Layer):
+
+    def __init__(self, units, input_dim=10000, activation=None,
+                 kernel_regularizer=None, **kwargs):
+        super().__init__(**kwargs)
+        self.units = units
+        self.input_dim = input_dim
+        self.activation = keras.activations.get(activation)
+        self.kernel_regularizer = keras.regularizers.get(kernel_regularizer)
+
+    def build(self, input_shape):
+        self.kernel = self.add_weight(name="kernel",
+                                      shape=(self.input_dim, self.units),
+                                      initializer="glorot_uniform",
+                                      regularizer=self.kernel_regularizer)
+        self.bias = self.add_weight(name="bias", shape=(self.units,),
+                                    initializer="zeros")
+
+    def call(self, tokens):
+        if isinstance(tokens, tf.RaggedTensor):
+            ids = tokens.flat_values
+            rows = tokens.value_rowids()
+            num_rows = tokens.nrows()
+        else:
+            present = tokens != PAD
+            ids = tf.boolean_mask(tokens, present)
+            rows = tf.where(present)[:, 0]
+            num_rows = tf.shape(tokens)[0]
+        kernel = tf.cast(self.kernel, self.compute_dtype)
+        outputs = tf.sparse.segment_sum(kernel, tf.cast(ids, "int32"),
+                                        tf.cast(rows, "int32"),
+                                        num_segments=num_rows)
+        outputs = outputs + tf.cast(self.bias, self.compute_dtype)
+        return self.activation(outputs)
+
+    def compute_output_shape(self, input_shape):
+        return (input_shape[0], self.units)
+
+    def get_config(self):
+        config = super().get_config()
+        config.update({
+            "units": self.units,
+            "input_dim": self.input_dim,
+            "activation": keras.activations.serialize(self.activation),
+            "kernel_regularizer": keras.regularizers.serialize(self.kernel_regularizer),
+        })
+        return config
@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+"""Declarative versions of the model variants trained in the assignment.
+
+Each entry of `VARIANTS` describes one network from the script:
+
+    units       sizes of the hidden Dense layers (its length is the depth)
+    activation  hidden-layer activation
+    loss        "binary_crossentropy" or "mse"
+    l2          L2 kernel-regularisation factor, or None
+    dropout     dropout rate after every hidden layer, or None
+    epochs      epoch count of the final fit on the full training set
+    retrain     True if the final fit starts from a fresh model, as the
+                script's "Retraining a model from scratch" cells do for
+                `model` (4 epochs) and `model_2` (5 epochs); the other
+                variants keep training the model of the validation fit
+
+An entry may also set `validation_epochs`, which overrides the argument of
+`train_variant`; `model_2` sets it to 0, since the script fits it from
+scratch without a validation fit.
+
+`build_model` turns one entry into a compiled Keras model and
+`train_variant` runs the script's two fits for it: 20 epochs against the
+hold-out split, then the final fit on `x_train` and `evaluate` on `x_test`
+(optionally with early stopping, see its docstring).
+"""
+
+import sys
+import time
+
+from imdb_encoding import keras_inputs, validation_inputs
+
+DEFAULTS = {
+    "units": (16, 16),
+    "activation": "relu",
+    "loss": "binary_crossentropy",
+    "l2": None,
+    "dropout": None,
+    "epochs": 8,
+    "retrain": False,
+}
+
+VARIANTS = {
+    "model": {"epochs": 4, "retrain": True},
+    "model_2": {"epochs": 5, "retrain": True, "validation_epochs": 0},
+    "model_11": {"units": (16, 16, 16), "epochs": 12},
+    "model_21": {"units": (32, 32)},
+    "model_22": {"units": (64, 64)},
+    "model_23": {"units": (128, 128)},
+    "model_MSE": {"loss": "mse"},
+    "model_tanh": {"activation": "tanh"},
+    "model_regularisation": {"l2": 0.001},
+    "model_Dropout": {"dropout": 0.5},
+    "model_Hyper": {"units": (32, 32, 16), "l2": 0.0001, "dropout": 0.5, "loss": "mse"},
+}
+
+
+def variant_config(name, **overrides):
+    """Return the full config of a named variant, with optional overrides."""
+    return {**DEFAULTS, **VARIANTS[name], **overrides}
+
+
+def build_model(config, token_input=False, num_words=10000, precision="float32",
+                jit_compile="auto"):
+    """Compiled Keras model for `config`.
+
+    With `token_input=True` the first layer is `imdb_layers.TokenBagDense`,
+    which takes padded word indices instead of multi-hot rows and computes
+    the same outputs as the first `Dense` layer.
+
+    `precision` is a Keras dtype policy: "float32", "mixed_bfloat16" or
+    "mixed_float16". With a mixed policy the hidden layers compute in 16 bit
+    while the weights and the sigmoid output stay float32. "mixed_float16"
+    also wraps the optimizer in a `LossScaleOptimizer`; bfloat16 has the
+    exponent range of float32 and needs no loss scaling.
+
+    `jit_compile=True` compiles the train, test and predict steps with XLA
+    (Keras' "auto" leaves them uncompiled on CPU-only machines).
+    """
+    from tensorflow import keras
+    from tensorflow.keras import layers, regularizers
+
+    policy = keras.mixed_precision.Policy(precision)
+    model_layers = []
+    for i, units in enumerate(config["units"]):
+        regularizer = regularizers.l2(config["l2"]) if config["l2"] else None
+        if token_input and i == 0:
+            from imdb_layers import TokenBagDense
+            layer = TokenBagDense(units, input_dim=num_words,
+                                  activation=config["activation"],
+                                  kernel_regularizer=regularizer, dtype=policy)
+        else:
+            layer = layers.Dense(units, activation=config["activation"],
+                                 kernel_regularizer=regularizer, dtype=policy)
+        model_layers.append(layer)
+        if config["dropout"]:
+            model_layers.append(layers.Dropout(config["dropout"], dtype=policy))
+    model_layers.append(layers.Dense(1, activation="sigmoid", dtype="float32"))
+    model = keras.Sequential(model_layers)
+    optimizer = keras.optimizers.Adam()
+    if precision == "mixed_float16":
+        optimizer = keras.mixed_precision.LossScaleOptimizer(optimizer)
+    model.compile(optimizer=optimizer,
+                  loss=config["loss"],
+                  metrics=["accuracy"],
+                  jit_compile=jit_compile)
+    return model
+
+
+def split_validation(x_train, y_train, num_validation=10000):
+    """The script's hold-out split: the first 10000 reviews validate."""
+    return (x_train[num_validation:], y_train[num_validation:],
+            x_train[:num_validation], y_train[:num_validation])
+
+
+def reset_peak_rss():
+    """Start a new peak-RSS measurement; False where the OS cannot do that.
+
+    Linux resets the process' RSS high-water mark (`VmHWM`) when "5" is
+    written to /proc/self/clear_refs.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        return False
+    return True
+
+
+def peak_rss_mb():
+    """Peak resident set size in MiB since the last `reset_peak_rss`.
+
+    Without /proc (or before any reset) this is the peak over the whole
+    process lifetime.
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 2**10
+    except OSError:
+        pass
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def train_variant(config, data, validation_epochs=20, batch_size=512, verbose=0,
+                  early_stopping=False, patience=3, warm_start=False,
+                  precision="float32", profile=False, trace_steps=None, logdir=None,
+                  jit_compile="auto"):
+    """Run the validation fit, the final fit and the test evaluation.
+
+    `data` holds `x_train`, `y_train`, `x_test` and `y_test`, for example
+    as returned by `imdb_cache.load_encoded`. Packed ("packed" encoding)
+    rows are fed through `imdb_encoding.keras_inputs`, so they are unpacked
+    one batch at a time and never densified as a whole.
+
+    By default this matches the script: 20 validation epochs, then the
+    trained model is fitted for another `config["epochs"]` on `x_train`, or
+    a fresh one if `config["retrain"]` is set.
+    `config["validation_epochs"]`, if present, overrides `validation_epochs`.
+    With 0 there is no validation fit: a fresh model is fitted on `x_train`
+    (`early_stopping` is ignored), and the history is that of this fit.
+    With `early_stopping=True` the validation fit stops once `val_loss` has
+    not improved for `patience` epochs and keeps the best-epoch weights. A
+    fresh model is then fitted on `x_train` for exactly that many epochs, or,
+    with `warm_start=True`, the best-epoch model is evaluated as it is.
+
+    `precision` and `jit_compile` are passed to `build_model`. The outcome
+    records training throughput (examples/sec over both fits) and the peak
+    RSS of this run (None where it cannot be told apart from earlier runs
+    in the same process, see `reset_peak_rss`) next to the test loss and
+    accuracy. With `profile=True` it also holds the per-epoch
+    `imdb_profiling.PerfMonitor` rows of both fits under `"perf"`;
+    `trace_steps` and `logdir` capture a TF profiler trace of those steps.
+    Profiled fits read their batches through `PerfMonitor.timed`, so the
+    batch order (not the data) differs from an unprofiled run.
+    """
+    start = time.perf_counter()
+    per_run_peak = reset_peak_rss()
+    partial_x_train, partial_y_train, x_val, y_val = split_validation(
+        data["x_train"], data["y_train"])
+    model = build_model(config, precision=precision, jit_compile=jit_compile)
+    callbacks = []
+    monitors = {}
+    if profile:
+        from imdb_profiling import PerfMonitor
+        monitors["validation"] = PerfMonitor(batch_size, len(partial_x_train),
+                                             trace_steps, logdir)
+        monitors["final"] = PerfMonitor(batch_size, len(data["x_train"]))
+        callbacks.append(monitors["validation"])
+    if early_stopping:
+        from tensorflow import keras
+        callbacks.append(keras.callbacks.EarlyStopping(
+            monitor="val_loss", patience=patience, restore_best_weights=True))
+    validation_epochs = config.get("validation_epochs", validation_epochs)
+    history = None
+    best_epoch = None
+    fit_time = 0.0
+    examples = 0
+    if validation_epochs:
+        fit_start = time.perf_counter()
+        if profile:
+            inputs = {"x": monitors["validation"].timed(partial_x_train, partial_y_train,
+                                                        shuffle=True)}
+        else:
+            inputs = keras_inputs(partial_x_train, partial_y_train, batch_size,
+                                  shuffle=True)
+        history = model.fit(**inputs,
+                            epochs=validation_epochs,
+                            validation_data=validation_inputs(x_val, y_val, batch_size),
+                            callbacks=callbacks,
+                            verbose=verbose)
+        fit_time = time.perf_counter() - fit_start
+        val_loss = history.history["val_loss"]
+        examples = len(val_loss) * len(partial_x_train)
+        best_epoch = val_loss.index(min(val_loss)) + 1
+    if not early_stopping or not validation_epochs:
+        final_epochs = config["epochs"]
+        if validation_epochs and config.get("retrain"):
+            model = build_model(config, precision=precision, jit_compile=jit_compile)
+    elif warm_start:
+        final_epochs = 0
+    else:
+        model = build_model(config, precision=precision, jit_compile=jit_compile)
+        final_epochs = best_epoch
+    if final_epochs:
+        fit_start = time.perf_counter()
+        if profile:
+            inputs = {"x": monitors["final"].timed(data["x_train"], data["y_train"],
+                                                   shuffle=True)}
+        else:
+            inputs = keras_inputs(data["x_train"], data["y_train"], batch_size, shuffle=True)
+        final_history = model.fit(**inputs, epochs=final_epochs, verbose=verbose,
+                                  callbacks=[monitors["final"]] if profile else [])
+        history = history or final_history
+        fit_time += time.perf_counter() - fit_start
+        examples += final_epochs * len(data["x_train"])
+    # Keras' default evaluation batch size, as in the script.
+    results = model.evaluate(**keras_inputs(data["x_test"], data["y_test"], 32),
+                             verbose=verbose)
+    outcome = {
+        "model": model,
+        "history": history.history,
+        "results": results,
+        "best_epoch": best_epoch,
+        "final_epochs": final_epochs,
+        "precision": precision,
+        "throughput": examples / fit_time,
+        "peak_rss_mb": peak_rss_mb() if per_run_peak else None,
+        "wall_time": time.perf_counter() - start,
+    }
+    if profile:
+        outcome["perf"] = {phase: monitor.epochs for phase, monitor in monitors.items()}
+    return outcome
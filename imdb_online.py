@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""Incremental updates of a published model from newly labeled reviews.
+
+Absorbing new reviews used to mean re-encoding everything and fitting from
+scratch. `update` instead loads the latest published version, encodes only
+the new batch, mixes it with a bounded replay sample drawn from the cached
+training set (so the model does not drift towards the new batch alone),
+runs a few epochs over that mix and publishes the result as the next
+version. Each update reports its throughput and a drift check on `x_test`:
+accuracy before and after, and the fraction of test predictions that
+flipped.
+
+Versions live in one directory as `v0001.keras`, `v0002.keras`, ... with a
+`LATEST` file naming the current one. Both are written to a temporary name
+and renamed, so a reader never sees a half-written model.
+
+    python imdb_online.py init model_21 --models models
+    python imdb_online.py update new_reviews.jsonl --models models
+    python imdb_online.py update --simulate 1000 --models models
+
+New reviews are JSON lines with `text` (or word indices in `sequence`) and
+`label`.
+"""
+
+import json
+import os
+import time
+
+import numpy as np
+from tensorflow import keras
+
+from imdb_encoding import keras_inputs, vectorize_sequences
+
+
+def latest_version(directory):
+    try:
+        with open(os.path.join(directory, "LATEST")) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def load_latest(directory):
+    """The current model of `directory` and its version record."""
+    version = latest_version(directory)
+    if version is None:
+        raise FileNotFoundError(f"no published model in {directory}")
+    return keras.models.load_model(os.path.join(directory, version["file"])), version
+
+
+def publish(model, directory, **info):
+    """Save `model` as the next version and point `LATEST` at it."""
+    os.makedirs(directory, exist_ok=True)
+    previous = latest_version(directory)
+    number = previous["version"] + 1 if previous else 1
+    name = f"v{number:04d}.keras"
+    tmp = os.path.join(directory, f".{name}.tmp.keras")
+    model.save(tmp)
+    os.replace(tmp, os.path.join(directory, name))
+    version = {"version": number, "file": name, "parent": previous and previous["version"],
+               "created_at": time.time(), **info}
+    tmp = os.path.join(directory, ".LATEST.tmp")
+    with open(tmp, "w") as f:
+        json.dump(version, f)
+    os.replace(tmp, os.path.join(directory, "LATEST"))
+    return version
+
+
+def replay_sample(x_train, y_train, size, seed=0):
+    """`size` rows of the stored training set, gathered in index order."""
+    size = min(size, len(x_train))
+    indices = np.sort(np.random.default_rng(seed).choice(len(x_train), size, replace=False))
+    return np.asarray(x_train[indices]), np.asarray(y_train[indices])
+
+
+def _predict(model, x, batch_size=512):
+    return model.predict(**keras_inputs(x, batch_size=batch_size), verbose=0).reshape(-1)
+
+
+def update(directory, sequences, labels, data, replay_size=4096, epochs=2,
+           batch_size=512, seed=0):
+    """Train the latest model of `directory` on new reviews and publish it.
+
+    `sequences` are the new reviews as word indices, `data` the cached
+    encoding (`imdb_cache.load_encoded`) that supplies the replay sample
+    and `x_test`. Returns the new version record, which carries the
+    throughput and drift figures.
+    """
+    start = time.perf_counter()
+    model, parent = load_latest(directory)
+    num_words = data["x_train"].shape[1]
+    x_new = vectorize_sequences(sequences, num_words, dtype="float32")
+    y_new = np.asarray(labels, dtype="float32")
+    x_replay, y_replay = replay_sample(data["x_train"], data["y_train"], replay_size,
+                                       seed=seed + parent["version"])
+    x = np.concatenate([x_new, x_replay])
+    y = np.concatenate([y_new, y_replay])
+
+    x_test, y_test = data["x_test"], np.asarray(data["y_test"]) > 0.5
+    before = _predict(model, x_test, batch_size)
+    keras.utils.set_random_seed(seed + parent["version"])
+    train_start = time.perf_counter()
+    model.fit(x, y, epochs=epochs, batch_size=batch_size, shuffle=True, verbose=0)
+    train_time = time.perf_counter() - train_start
+    after = _predict(model, x_test, batch_size)
+
+    return publish(
+        model, directory,
+        variant=parent.get("variant"),
+        new_examples=len(x_new),
+        replay_examples=len(x_replay),
+        train_throughput=epochs * len(x) / train_time,
+        update_time=time.perf_counter() - start,
+        accuracy_before=float(np.mean((before > 0.5) == y_test)),
+        accuracy_after=float(np.mean((after > 0.5) == y_test)),
+        flipped=float(np.mean((before > 0.5) != (after > 0.5))),
+        mean_shift=float(np.mean(np.abs(after - before))),
+    )
+
+
+def read_reviews(path, word_index, num_words=10000):
+    """Word indices and labels from a JSON-lines file of new reviews."""
+    from imdb_serving import tokenize
+
+    sequences, labels = [], []
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            review = json.loads(line)
+            if "sequence" in review:
+                sequences.append(review["sequence"])
+            else:
+                sequences.append(tokenize(review["text"], word_index, num_words))
+            labels.append(review["label"])
+    return sequences, labels
+
+
+if __name__ == "__main__":
+    import argparse
+
+    import imdb_cache
+
+    parser = argparse.ArgumentParser(description="Publish and incrementally update models.")
+    parser.add_argument("command", choices=["init", "update"])
+    parser.add_argument("source", nargs="?",
+                        help="variant to train for init, JSON-lines reviews for update")
+    parser.add_argument("--models", default="models")
+    parser.add_argument("--simulate", type=int, metavar="N",
+                        help="update with N reviews sampled from the raw training split")
+    parser.add_argument("--replay", type=int, default=4096)
+    parser.add_argument("--epochs", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    data = imdb_cache.load_encoded()
+    if args.command == "init":
+        from imdb_models import train_variant, variant_config
+        name = args.source or "model"
+        keras.utils.set_random_seed(args.seed)
+        outcome = train_variant(variant_config(name), data)
+        version = publish(outcome["model"], args.models, variant=name,
+                          accuracy_after=float(outcome["results"][1]))
+        print(f"published {name} as version {version['version']}")
+    else:
+        if args.simulate:
+            from tensorflow.keras.datasets import imdb
+            (train_data, train_labels), _ = imdb.load_data(num_words=10000)
+            picked = np.random.default_rng(args.seed).choice(len(train_data), args.simulate,
+                                                             replace=False)
+            sequences, labels = train_data[picked], train_labels[picked]
+        else:
+            sequences, labels = read_reviews(args.source, data["word_index"])
+        version = update(args.models, sequences, labels, data, args.replay,
+                         args.epochs, seed=args.seed)
+        print(f"version {version['parent']} -> {version['version']}: "
+              f"{version['new_examples']} new + {version['replay_examples']} replayed "
+              f"in {version['update_time']:.1f} s "
+              f"({version['train_throughput']:.0f} ex/s training)")
+        print(f"drift on x_test: accuracy {version['accuracy_before']:.4f} -> "
+              f"{version['accuracy_after']:.4f}, {version['flipped']:.2%} predictions flipped, "
+              f"mean |Δscore| {version['mean_shift']:.4f}")
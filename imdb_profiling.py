@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+"""Per-epoch and per-step performance instrumentation for `fit`.
+
+`PerfMonitor` is a Keras callback. For every epoch it records:
+
+    input_time  time spent producing the training batches (slicing,
+                unpacking, converting), measured in the input source
+    step_time   time inside the train steps (forward, backward, update),
+                including any wait for a batch that was not ready yet
+    epoch_time  the whole epoch, including validation
+    examples_per_sec, rss_mb, peak_rss_mb
+
+Keras 3 fetches the next batch inside the compiled train function, after
+`on_train_batch_begin`, so callback timestamps cannot separate input from
+compute. The training input is therefore passed through `monitor.timed`,
+which wraps it in a `keras.utils.PyDataset` that times every
+`__getitem__`. The batches are prefetched on a tf.data thread, so
+`input_time` can overlap `step_time`; when it approaches `step_time`, the
+input pipeline is the bottleneck.
+
+It can also capture a TensorFlow profiler trace for a range of global steps.
+
+    monitor = PerfMonitor(batch_size=512, trace_steps=(10, 20), logdir="logs")
+    model.fit(monitor.timed(x_train, y_train, shuffle=True), callbacks=[monitor])
+    print(monitor.table())
+    monitor.to_json("model_21.perf.json")
+"""
+
+import json
+import os
+import time
+
+import numpy as np
+from tensorflow import keras
+
+from imdb_encoding import IndexBatches
+from imdb_models import peak_rss_mb
+
+
+def rss_mb():
+    """Current resident set size in MiB (Linux; 0 where /proc is missing)."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+    except OSError:
+        return 0.0
+    return pages * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+class TimedBatches(keras.utils.PyDataset):
+    """Forwards the batches of `source`, adding their production time to `monitor`."""
+
+    def __init__(self, source, monitor):
+        super().__init__()
+        self.source = source
+        self.monitor = monitor
+
+    def __len__(self):
+        return len(self.source)
+
+    def __getitem__(self, index):
+        start = time.perf_counter()
+        batch = self.source[index]
+        self.monitor.input_time += time.perf_counter() - start
+        return batch
+
+    def on_epoch_begin(self):
+        self.source.on_epoch_begin()
+
+    def on_epoch_end(self):
+        self.source.on_epoch_end()
+
+
+class PerfMonitor(keras.callbacks.Callback):
+
+    def __init__(self, batch_size, num_samples=None, trace_steps=None, logdir=None):
+        super().__init__()
+        self.batch_size = batch_size
+        self.num_samples = num_samples
+        self.trace_steps = trace_steps
+        self.logdir = logdir
+        self.epochs = []
+        self.global_step = 0
+        self.tracing = False
+        self.input_time = 0.0
+
+    def timed(self, x, y=None, batch_size=None, shuffle=False):
+        """Training input for `fit` whose batch production is timed.
+
+        `x` is a `keras.utils.PyDataset`, packed rows or an array. Rows are
+        batched by `imdb_encoding.IndexBatches`, with a shuffle seed drawn
+        from NumPy's global generator, so their batch order differs from
+        that of `fit` on the bare arrays.
+        """
+        batch_size = batch_size or self.batch_size
+        if isinstance(x, keras.utils.PyDataset):
+            source = x
+        else:
+            seed = int(np.random.randint(2**31)) if shuffle else None
+            source = IndexBatches(x, y, None, batch_size, shuffle, seed)
+        return TimedBatches(source, self)
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self.epoch_start = time.perf_counter()
+        self.last_step_end = self.epoch_start
+        # Batches produced before the epoch (e.g. while Keras infers the
+        # input signature) are not part of it.
+        self.input_time = 0.0
+        self.step_time = 0.0
+        self.steps = 0
+
+    def on_train_batch_begin(self, batch, logs=None):
+        if self.trace_steps and self.global_step == self.trace_steps[0]:
+            import tensorflow as tf
+            tf.profiler.experimental.start(self.logdir or "logs")
+            self.tracing = True
+        self.step_start = time.perf_counter()
+
+    def on_train_batch_end(self, batch, logs=None):
+        self.last_step_end = time.perf_counter()
+        self.step_time += self.last_step_end - self.step_start
+        self.steps += 1
+        self.global_step += 1
+        if self.tracing and self.global_step >= self.trace_steps[1]:
+            self._stop_trace()
+
+    def on_epoch_end(self, epoch, logs=None):
+        examples = self.steps * self.batch_size
+        if self.num_samples:
+            examples = min(examples, self.num_samples)
+        train_time = self.last_step_end - self.epoch_start
+        self.epochs.append({
+            "epoch": epoch + 1,
+            "steps": self.steps,
+            "input_time": self.input_time,
+            "step_time": self.step_time,
+            "epoch_time": time.perf_counter() - self.epoch_start,
+            "examples_per_sec": examples / train_time if train_time else 0.0,
+            "rss_mb": rss_mb(),
+            "peak_rss_mb": peak_rss_mb(),
+        })
+
+    def on_train_end(self, logs=None):
+        if self.tracing:
+            self._stop_trace()
+
+    def _stop_trace(self):
+        import tensorflow as tf
+        tf.profiler.experimental.stop()
+        self.tracing = False
+
+    def table(self):
+        return perf_table(self.epochs)
+
+    def to_json(self, path):
+        with open(path, "w") as f:
+            json.dump(self.epochs, f, indent=1)
+
+
+def perf_table(rows):
+    """Compact text table of `PerfMonitor.epochs` rows."""
+    lines = ["epoch  steps input(s)  step(s)  epoch(s)    ex/s   RSS(MiB)"]
+    for row in rows:
+        lines.append(f"{row['epoch']:>5}  {row['steps']:>5}  {row['input_time']:7.3f}"
+                     f"  {row['step_time']:7.3f}  {row['epoch_time']:8.3f}"
+                     f"  {row['examples_per_sec']:7.0f}  {row['rss_mb']:8.0f}")
+    return "\n".join(lines)
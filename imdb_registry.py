@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""SQLite experiment store replacing the loose `history_dictNN` globals.
+
+Every training run is one row: the hash of everything that determines its
+outcome (model config, seed, training options, data settings; see
+`run_key`), the seed, the per-epoch history, the final test loss and
+accuracy, wall time, the peak RSS of that run (NULL where the process
+peak cannot be reset, see `imdb_models.reset_peak_rss`) and, for
+profiled runs, the per-epoch performance rows. `run_or_load`
+looks a run up by that hash first, so re-running an unchanged config is a
+cache hit and does not retrain.
+
+    python imdb_registry.py                     # train missing variants, plot
+    python imdb_registry.py summary.png         # same, saving the chart
+"""
+
+import hashlib
+import inspect
+import json
+import sqlite3
+import sys
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    config_hash TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    config TEXT NOT NULL,
+    seed INTEGER,
+    history TEXT NOT NULL,
+    test_loss REAL NOT NULL,
+    test_accuracy REAL NOT NULL,
+    wall_time REAL NOT NULL,
+    peak_rss_mb REAL,
+    created_at REAL NOT NULL,
+    perf TEXT
+)
+"""
+
+
+DATA_DEFAULTS = {"num_words": 10000, "encoding": "dense", "dtype": "float32"}
+# `train_variant` options that change what is reported, not the outcome.
+# `profile` is not one of them: profiled fits batch their input differently.
+REPORTING_OPTIONS = ("verbose", "trace_steps", "logdir")
+
+
+def config_hash(config, seed=None, **options):
+    """Stable hash of a run's config, seed and training/data options."""
+    key = {"config": config, "seed": seed, "options": options}
+    payload = json.dumps(key, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+def run_key(config, seed=None, data_options=None, **train_options):
+    """`config_hash` of a `train_variant` run, normalised.
+
+    `train_variant`'s defaults are filled in and the data options default
+    to `DATA_DEFAULTS`, so leaving an option out and passing its default
+    value give the same key. `REPORTING_OPTIONS` are left out. A
+    `checkpoint_dir` (training through `train_variant_resumable`) is
+    recorded as `resumable=True`, independent of the directory.
+    """
+    from imdb_models import train_variant
+
+    train_options = dict(train_options)
+    resumable = bool(train_options.pop("checkpoint_dir", None))
+    train_options.pop("writer", None)
+    bound = inspect.signature(train_variant).bind(config, None, **train_options)
+    bound.apply_defaults()
+    options = {name: value for name, value in bound.arguments.items()
+               if name not in ("config", "data", *REPORTING_OPTIONS)}
+    if resumable:
+        options["resumable"] = True
+    data = {**DATA_DEFAULTS, **(data_options or {})}
+    return config_hash(config, seed, data=data, **options)
+
+
+class ExperimentStore:
+
+    def __init__(self, path="experiments.sqlite"):
+        self.connection = sqlite3.connect(path)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute(SCHEMA)
+        columns = [row[1] for row in self.connection.execute("PRAGMA table_info(runs)")]
+        if "perf" not in columns:
+            self.connection.execute("ALTER TABLE runs ADD COLUMN perf TEXT")
+
+    def get(self, key):
+        row = self.connection.execute(
+            "SELECT * FROM runs WHERE config_hash = ?", (key,)).fetchone()
+        return None if row is None else self._record(row)
+
+    def put(self, key, name, config, seed, outcome):
+        loss, accuracy = outcome["results"][:2]
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO runs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, name, json.dumps(config), seed,
+                 json.dumps(outcome["history"]), loss, accuracy,
+                 outcome["wall_time"], outcome.get("peak_rss_mb"), time.time(),
+                 json.dumps(outcome.get("perf"))))
+
+    def all(self):
+        rows = self.connection.execute("SELECT * FROM runs ORDER BY name, created_at")
+        return [self._record(row) for row in rows]
+
+    def latest_by_name(self):
+        """The most recent run of every variant name."""
+        return {record["name"]: record for record in self.all()}
+
+    @staticmethod
+    def _record(row):
+        record = dict(row)
+        record["config"] = json.loads(record["config"])
+        record["history"] = json.loads(record["history"])
+        record["perf"] = json.loads(record["perf"]) if record["perf"] else None
+        return record
+
+
+def run_or_load(store, name, config, data, seed=0, data_options=None, **train_options):
+    """Return the stored run for this config, training it only on a miss."""
+    key = run_key(config, seed, data_options, **train_options)
+    record = store.get(key)
+    if record is not None:
+        record["cache_hit"] = True
+        return record
+
+    from tensorflow import keras
+
+    from imdb_models import train_variant
+    keras.utils.set_random_seed(seed)
+    outcome = train_variant(config, data, **train_options)
+    store.put(key, name, config, seed, outcome)
+    record = store.get(key)
+    record["cache_hit"] = False
+    return record
+
+
+def plot_summary(store, path=None):
+    """Scatter of test loss vs accuracy (x100) for the latest run of each variant."""
+    import matplotlib.pyplot as plt
+
+    records = store.latest_by_name()
+    labels = list(records)
+    all_loss = [records[name]["test_loss"] * 100 for name in labels]
+    all_accuracy = [records[name]["test_accuracy"] * 100 for name in labels]
+    fig, ax = plt.subplots()
+    ax.scatter(all_loss, all_accuracy)
+    for i, txt in enumerate(labels):
+        ax.annotate(txt, (all_loss[i], all_accuracy[i]))
+    plt.title("Summary for Accuracy and Loss")
+    plt.ylabel("Accuracy")
+    plt.xlabel("Loss")
+    if path:
+        fig.savefig(path)
+    else:
+        plt.show()
+    return fig
+
+
+if __name__ == "__main__":
+    import imdb_cache
+    from imdb_models import VARIANTS, variant_config
+
+    store = ExperimentStore()
+    data_options = dict(DATA_DEFAULTS)
+    data = imdb_cache.load_encoded(**data_options)
+    for name in VARIANTS:
+        record = run_or_load(store, name, variant_config(name), data,
+                             data_options=data_options)
+        status = "cached " if record["cache_hit"] else "trained"
+        print(f"{status} {name:<22} loss {record['test_loss']:.4f}"
+              f"  acc {record['test_accuracy']:.4f}  {record['wall_time']:7.1f} s")
+    plot_summary(store, sys.argv[1] if len(sys.argv) > 1 else None)
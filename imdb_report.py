@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""Headless report of all stored runs: curves, summary chart and one HTML page.
+
+The script draws every loss/accuracy figure with copy-pasted code and
+blocks on `plt.show()`. Here plotting is a separate stage that reads the
+histories from the experiment store (`imdb_registry`), so training never
+waits on it and never imports matplotlib. The curves of every variant are
+rendered in parallel by a process pool using the non-interactive Agg
+backend, and bundled with the loss/accuracy summary into a self-contained
+`index.html` (images embedded) next to the individual PNGs.
+
+    python imdb_report.py                            # experiments.sqlite -> report/
+    python imdb_report.py runs.sqlite --output out
+"""
+
+import base64
+import html
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+
+def _pyplot():
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def render_curves(name, history, path):
+    """Training and validation loss/accuracy of one run, as in the script."""
+    plt = _pyplot()
+    epochs = range(1, len(history["loss"]) + 1)
+    fig, (ax_loss, ax_acc) = plt.subplots(1, 2, figsize=(10, 4))
+    for ax, metric, label in [(ax_loss, "loss", "loss"), (ax_acc, "accuracy", "acc")]:
+        ax.plot(epochs, history[metric], "bo", label=f"Training {label}")
+        if f"val_{metric}" in history:
+            ax.plot(epochs, history[f"val_{metric}"], "b", label=f"Validation {label}")
+        ax.set_title(f"Training and validation {metric}")
+        ax.set_xlabel("Epochs")
+        ax.set_ylabel(metric.capitalize())
+        ax.legend()
+    fig.suptitle(name)
+    fig.savefig(path)
+    plt.close(fig)
+    return path
+
+
+def render_summary(records, path):
+    """Scatter of test loss vs accuracy (x100), one point per variant."""
+    plt = _pyplot()
+    fig, ax = plt.subplots()
+    for name, record in records.items():
+        point = (record["test_loss"] * 100, record["test_accuracy"] * 100)
+        ax.scatter(*point, color="b")
+        ax.annotate(name, point)
+    ax.set_title("Summary for Accuracy and Loss")
+    ax.set_ylabel("Accuracy")
+    ax.set_xlabel("Loss")
+    fig.savefig(path)
+    plt.close(fig)
+    return path
+
+
+def _embedded(path):
+    with open(path, "rb") as f:
+        return "data:image/png;base64," + base64.b64encode(f.read()).decode()
+
+
+def _write_html(records, images, summary, path):
+    rows = "\n".join(
+        f"<tr><td>{html.escape(name)}</td><td>{record['test_loss']:.4f}</td>"
+        f"<td>{record['test_accuracy']:.4f}</td><td>{record['wall_time']:.1f}</td></tr>"
+        for name, record in records.items())
+    figures = "\n".join(
+        f'<h2>{html.escape(name)}</h2>\n<img src="{_embedded(images[name])}">'
+        for name in records)
+    with open(path, "w") as f:
+        f.write(f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>IMDB experiments</title></head>
+<body>
+<h1>IMDB experiments</h1>
+<table border="1" cellpadding="4">
+<tr><th>Variant</th><th>Test loss</th><th>Test accuracy</th><th>Wall time (s)</th></tr>
+{rows}
+</table>
+<img src="{_embedded(summary)}">
+{figures}
+</body></html>
+""")
+    return path
+
+
+def build_report(records, directory="report", num_workers=None):
+    """Render `records` ({name: stored run}) into `directory`.
+
+    Returns the path of the HTML page. The per-variant curves are rendered
+    by `num_workers` processes (default: one per CPU, at most one per run).
+    """
+    os.makedirs(directory, exist_ok=True)
+    names = list(records)
+    paths = [os.path.join(directory, f"{name}.png") for name in names]
+    summary = os.path.join(directory, "summary.png")
+    num_workers = num_workers or min(len(names) + 1, os.cpu_count() or 1)
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(num_workers, mp_context=context) as pool:
+        summary_future = pool.submit(render_summary, records, summary)
+        rendered = list(pool.map(render_curves, names,
+                                 [records[name]["history"] for name in names], paths))
+        summary_future.result()
+    return _write_html(records, dict(zip(names, rendered)), summary,
+                       os.path.join(directory, "index.html"))
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    from imdb_registry import ExperimentStore
+
+    parser = argparse.ArgumentParser(description="Render stored runs into an HTML report.")
+    parser.add_argument("store", nargs="?", default="experiments.sqlite")
+    parser.add_argument("--output", default="report")
+    parser.add_argument("--workers", type=int)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    records = ExperimentStore(args.store).latest_by_name()
+    if not records:
+        parser.exit(1, f"no runs in {args.store}\n")
+    page = build_report(records, args.output, args.workers)
+    print(f"{len(records)} runs -> {page} in {time.perf_counter() - start:.1f} s")
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""Low-latency, micro-batched inference around a trained classifier.
+
+Requests (raw review text or word indices) go through an asyncio queue. A
+single batching task collects them until `max_batch_size` requests are
+waiting or the oldest one has waited `max_wait` seconds, encodes the batch
+and runs one forward pass through a precompiled `tf.function`, off the
+event loop.
+
+    server = ReviewClassifier(model, word_index)
+    async with server:
+        score = await server.predict("this movie was wonderful")
+
+Running the module trains the baseline model (or loads `sys.argv[1]`, a
+saved `.keras` model), drives it with a local load generator and reports
+p50/p99 latency and throughput.
+"""
+
+import asyncio
+import re
+import sys
+import time
+
+import numpy as np
+import tensorflow as tf
+
+from imdb_encoding import INDEX_FROM, OOV_CHAR, START_CHAR, vectorize_sequences
+
+
+def tokenize(text, word_index, num_words=10000):
+    """Turn review text into word indices the way `imdb.load_data` does."""
+    words = re.findall(r"[a-z0-9']+", text.lower())
+    ids = [START_CHAR]
+    for word in words:
+        index = word_index.get(word)
+        if index is None or index + INDEX_FROM >= num_words:
+            ids.append(OOV_CHAR)
+        else:
+            ids.append(index + INDEX_FROM)
+    return ids
+
+
+class ReviewClassifier:
+    """Scores reviews one request at a time, batching them behind the scenes."""
+
+    def __init__(self, model, word_index=None, num_words=10000,
+                 max_batch_size=64, max_wait=0.002):
+        self.word_index = word_index
+        self.num_words = num_words
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.forward = tf.function(
+            lambda x: model(x, training=False),
+            input_signature=[tf.TensorSpec([None, num_words], tf.float32)])
+        # Trace once up front so the first request does not pay for it.
+        self.forward(tf.zeros([1, num_words]))
+        self.queue = None
+        self.worker = None
+
+    async def __aenter__(self):
+        self.queue = asyncio.Queue()
+        self.worker = asyncio.create_task(self._serve())
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.worker.cancel()
+        try:
+            await self.worker
+        except asyncio.CancelledError:
+            pass
+        # Requests still queued will never be served; their callers get
+        # CancelledError instead of waiting forever.
+        while not self.queue.empty():
+            _, future = self.queue.get_nowait()
+            future.cancel()
+
+    async def predict(self, review):
+        """Positive-review probability for `review` (text or word indices).
+
+        Word indices of `num_words` or more, and negative ones, are mapped
+        to `OOV_CHAR` as `imdb.load_data` does, so that one malformed request
+        cannot fail the batch it is served in.
+        """
+        if isinstance(review, str):
+            review = tokenize(review, self.word_index, self.num_words)
+        else:
+            review = np.asarray(review, dtype=np.int64)
+            review = np.where((review < 0) | (review >= self.num_words), OOV_CHAR, review)
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((review, future))
+        return await future
+
+    def predict_batch(self, reviews):
+        x = vectorize_sequences(reviews, self.num_words, dtype="float32")
+        return self.forward(x).numpy()[:, 0]
+
+    async def _serve(self):
+        loop = asyncio.get_running_loop()
+        batch = []
+        try:
+            while True:
+                batch = [await self.queue.get()]
+                deadline = loop.time() + self.max_wait
+                while len(batch) < self.max_batch_size:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+                await self._score(loop, batch)
+        except asyncio.CancelledError:
+            for _, future in batch:
+                future.cancel()
+            raise
+
+    async def _score(self, loop, batch):
+        reviews = [review for review, _ in batch]
+        try:
+            scores = await loop.run_in_executor(None, self.predict_batch, reviews)
+        except Exception as e:
+            if len(batch) == 1:
+                if not batch[0][1].done():
+                    batch[0][1].set_exception(e)
+                return
+            # Score the requests one by one, so only the failing ones fail.
+            for request in batch:
+                await self._score(loop, [request])
+        else:
+            for (_, future), score in zip(batch, scores):
+                if not future.done():
+                    future.set_result(float(score))
+
+
+async def load_test(server, reviews, concurrency=32, num_requests=2000):
+    """Fire `num_requests` requests from `concurrency` clients at once."""
+    latencies = []
+
+    async def client(requests):
+        for review in requests:
+            start = time.perf_counter()
+            await server.predict(review)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    async with server:
+        await asyncio.gather(*(
+            client(reviews[i:num_requests:concurrency]) for i in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies = np.array(latencies) * 1000
+    return {
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "throughput": len(latencies) / elapsed,
+    }
+
+
+if __name__ == "__main__":
+    from tensorflow import keras
+    from tensorflow.keras.datasets import imdb
+
+    import imdb_cache
+    from imdb_models import build_model, variant_config
+
+    data = imdb_cache.load_encoded()
+    if len(sys.argv) > 1:
+        model = keras.models.load_model(sys.argv[1])
+    else:
+        model = build_model(variant_config("model"))
+        model.fit(data["x_train"], data["y_train"], epochs=4, batch_size=512, verbose=0)
+    _, (test_data, _) = imdb.load_data(num_words=10000)
+    server = ReviewClassifier(model, data["word_index"])
+
+    async def score(text):
+        async with server:
+            return await server.predict(text)
+
+    print(f"'a truly wonderful film': {asyncio.run(score('a truly wonderful film')):.3f}")
+    for concurrency in [1, 8, 32, 128]:
+        report = asyncio.run(load_test(server, list(test_data), concurrency))
+        print(f"concurrency {concurrency:>3}: p50 {report['p50_ms']:6.2f} ms  "
+              f"p99 {report['p99_ms']:6.2f} ms  {report['throughput']:7.0f} req/s")
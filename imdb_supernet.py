@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""Train several variants as parallel heads of one graph, in one data pass.
+
+The width variants (`model`, `model_21`, `model_22`, `model_23`) each pay
+for the input pipeline and the 10000-wide first layer on their own. Here
+they become branches of a single functional model: the first layers of all
+heads are fused into one Dense layer (one matmul over the input, split by
+columns afterwards), and every head keeps its own layers, loss, metrics and
+history. The branches share no weights and Adam's state is per weight, so
+each head trains exactly as it would alone, just on the same batches.
+
+With several heads, Keras reports each head's loss without the L2
+penalties of its kernels (only the total `loss` includes them), so the
+head losses of regularised variants are not comparable with those of
+`train_variant`. Compare heads by accuracy.
+
+    python imdb_supernet.py                      # the width sweep
+    python imdb_supernet.py model model_tanh model_MSE
+"""
+
+import sys
+import time
+
+from imdb_models import split_validation, variant_config
+
+WIDTH_VARIANTS = ["model", "model_21", "model_22", "model_23"]
+
+
+class SliceL2:
+    """L2 penalty with a separate factor for each column slice of a kernel."""
+
+    def __init__(self, slices):
+        self.slices = slices  # [(start, stop, factor)]
+
+    def __call__(self, kernel):
+        import tensorflow as tf
+        return tf.add_n([factor * tf.reduce_sum(tf.square(kernel[:, start:stop]))
+                         for start, stop, factor in self.slices])
+
+
+def build_supernet(configs, num_words=10000):
+    """Compiled multi-output model with one head per entry of `configs`."""
+    from tensorflow import keras
+    from tensorflow.keras import layers, regularizers
+
+    names = list(configs)
+    widths = [configs[name]["units"][0] for name in names]
+    offsets = [sum(widths[:i]) for i in range(len(widths) + 1)]
+    penalties = [(offsets[i], offsets[i + 1], configs[name]["l2"])
+                 for i, name in enumerate(names) if configs[name]["l2"]]
+
+    inputs = keras.Input(shape=(num_words,), name="reviews")
+    fused = layers.Dense(offsets[-1], kernel_regularizer=SliceL2(penalties) if penalties else None,
+                         name="fused_input")(inputs)
+    outputs = {}
+    for i, name in enumerate(names):
+        config = configs[name]
+        x = layers.Lambda(lambda t, i=i: t[:, offsets[i]:offsets[i + 1]],
+                          name=f"{name}_slice")(fused)
+        x = layers.Activation(config["activation"])(x)
+        if config["dropout"]:
+            x = layers.Dropout(config["dropout"])(x)
+        for units in config["units"][1:]:
+            regularizer = regularizers.l2(config["l2"]) if config["l2"] else None
+            x = layers.Dense(units, activation=config["activation"],
+                             kernel_regularizer=regularizer)(x)
+            if config["dropout"]:
+                x = layers.Dropout(config["dropout"])(x)
+        outputs[name] = layers.Dense(1, activation="sigmoid", name=name)(x)
+    model = keras.Model(inputs, outputs)
+    model.compile(optimizer="adam",
+                  loss={name: configs[name]["loss"] for name in names},
+                  metrics={name: ["accuracy"] for name in names})
+    return model
+
+
+def _metric(names, name, metric):
+    # A single-output model reports plain `loss`/`accuracy`; that `loss`
+    # includes the L2 penalties, like the loss of `train_variant`.
+    return metric if len(names) == 1 else f"{name}_{metric}"
+
+
+def split_history(history, names):
+    """Per-head `loss`/`accuracy`/`val_*` histories out of a multi-output fit."""
+    per_head = {}
+    for name in names:
+        per_head[name] = {prefix + metric: history[prefix + _metric(names, name, metric)]
+                          for prefix in ["", "val_"] for metric in ["loss", "accuracy"]
+                          if prefix + _metric(names, name, metric) in history}
+    return per_head
+
+
+def _head_results(model, names, data, batch_size):
+    scores = model.evaluate(data["x_test"], {name: data["y_test"] for name in names},
+                            batch_size=batch_size, return_dict=True, verbose=0)
+    return {name: [scores[_metric(names, name, "loss")],
+                   scores[_metric(names, name, "accuracy")]] for name in names}
+
+
+def train_heads(configs, data, validation_epochs=20, batch_size=512, verbose=0):
+    """The script's two fits for all `configs` at once.
+
+    Like `imdb_models.train_variant`, but every head is evaluated on the
+    test set after its own `config["epochs"]` of the final fit. All heads
+    keep training the weights of the validation fit; `config["retrain"]`
+    is not supported, since the heads share one model.
+    """
+    from tensorflow import keras
+
+    names = list(configs)
+    start = time.perf_counter()
+    partial_x_train, partial_y_train, x_val, y_val = split_validation(
+        data["x_train"], data["y_train"])
+    model = build_supernet(configs, num_words=data["x_train"].shape[1])
+    history = model.fit(partial_x_train,
+                        {name: partial_y_train for name in names},
+                        epochs=validation_epochs,
+                        batch_size=batch_size,
+                        validation_data=(x_val, {name: y_val for name in names}),
+                        verbose=verbose)
+    results = {}
+    due = {}
+    for name in names:
+        due.setdefault(configs[name]["epochs"], []).append(name)
+
+    class EvaluateDueHeads(keras.callbacks.Callback):
+        def on_epoch_end(self, epoch, logs=None):
+            if epoch + 1 in due:
+                scores = _head_results(self.model, names, data, batch_size)
+                for name in due[epoch + 1]:
+                    results[name] = scores[name]
+
+    model.fit(data["x_train"], {name: data["y_train"] for name in names},
+              epochs=max(due), batch_size=batch_size,
+              callbacks=[EvaluateDueHeads()], verbose=verbose)
+    wall_time = time.perf_counter() - start
+    histories = split_history(history.history, names)
+    return {name: {"history": histories[name], "results": results[name],
+                   "wall_time": wall_time} for name in names}
+
+
+if __name__ == "__main__":
+    import imdb_cache
+    from imdb_models import train_variant
+
+    names = sys.argv[1:] or WIDTH_VARIANTS
+    configs = {name: variant_config(name) for name in names}
+    data = imdb_cache.load_encoded()
+    outcomes = train_heads(configs, data)
+    shared = next(iter(outcomes.values()))["wall_time"]
+    separate = 0.0
+    for name in names:
+        # The heads cannot be retrained from scratch, so neither is the reference.
+        alone = train_variant(dict(configs[name], retrain=False), data)
+        separate += alone["wall_time"]
+        accuracy = outcomes[name]["results"][1]
+        print(f"{name:<22} test acc  head {accuracy:.4f}  alone {alone['results'][1]:.4f}")
+    print(f"one pass for all heads {shared:.1f} s vs separately {separate:.1f} s "
+          f"({separate / shared:.1f}x)")
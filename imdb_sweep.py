@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""Parallel sweep over the model variants.
+
+Every variant in `imdb_models.VARIANTS` is trained in its own worker of a
+process pool. Each worker is pinned to a disjoint subset of the CPU cores,
+with TensorFlow's thread pools sized to match, and reads the encoded
+dataset through the memory-mapped cache from `imdb_cache`, so the matrices
+are shared through the page cache instead of being pickled to each worker.
+
+    python imdb_sweep.py                  # all variants
+    python imdb_sweep.py model_21 model_23
+    python imdb_sweep.py --early-stopping
+    python imdb_sweep.py --precision=mixed_bfloat16   # bfloat16 inputs too
+    python imdb_sweep.py --store=experiments.sqlite   # skip stored runs
+    python imdb_sweep.py --profile                    # <name>.perf.json + table
+    python imdb_sweep.py --checkpoint-dir=checkpoints # resumable
+    python imdb_sweep.py --jit                        # XLA-compiled steps
+"""
+
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import imdb_cache
+from imdb_models import VARIANTS, train_variant, variant_config
+
+_worker_data = None
+
+
+def available_cores():
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def core_subsets(num_workers, cores=None):
+    """Split the available cores into `num_workers` disjoint subsets."""
+    cores = available_cores() if cores is None else cores
+    num_workers = max(1, min(num_workers, len(cores)))
+    return [cores[i::num_workers] for i in range(num_workers)]
+
+
+def _init_worker(core_queue, data_options):
+    global _worker_data
+    cores = core_queue.get()
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(len(cores))
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+    _worker_data = imdb_cache.load_encoded(**data_options)
+
+
+def worker_data():
+    """The memory-mapped dataset of the current pool worker."""
+    return _worker_data
+
+
+def make_pool(num_workers, data_options, cores=None):
+    """Process pool of pinned workers that memory-map `data_options`'s entry.
+
+    The cache entry is built here, before any worker starts, so the workers
+    only ever memory-map it.
+    """
+    imdb_cache.load_encoded(**data_options)
+    subsets = core_subsets(num_workers, cores)
+    context = multiprocessing.get_context("spawn")
+    core_queue = context.Queue()
+    for subset in subsets:
+        core_queue.put(subset)
+    return ProcessPoolExecutor(max_workers=len(subsets), mp_context=context,
+                               initializer=_init_worker,
+                               initargs=(core_queue, data_options))
+
+
+def _run_variant(name, config, seed, train_options):
+    if seed is not None:
+        from tensorflow import keras
+        keras.utils.set_random_seed(seed)
+    if train_options.get("checkpoint_dir"):
+        from imdb_checkpoint import train_variant_resumable
+        outcome = train_variant_resumable(name, config, worker_data(),
+                                          seed=seed or 0, **train_options)
+    else:
+        outcome = train_variant(config, worker_data(), **train_options)
+    outcome.pop("model", None)
+    outcome["pid"] = os.getpid()
+    return name, outcome
+
+
+def run_sweep(configs, num_workers=None, seed=None, num_words=10000,
+              dtype="float32", cores=None, store=None, **train_options):
+    """Train every config of `configs` ({name: config}) in a process pool.
+
+    Extra keyword arguments (e.g. `early_stopping=True`) are passed on to
+    `imdb_models.train_variant`. With `checkpoint_dir=...` every variant is
+    trained by `imdb_checkpoint.train_variant_resumable` instead, so an
+    interrupted sweep continues where it stopped when run again. With an
+    `imdb_registry.ExperimentStore`, configs that already have a stored run
+    are not retrained, and new runs are added to the store.
+
+    Returns {name: outcome} with the history, test results and wall time of
+    each variant, plus the total sweep time under the key `"_total"`.
+    """
+    start = time.perf_counter()
+    data_options = {"num_words": num_words, "encoding": "dense", "dtype": dtype}
+    outcomes = {}
+    keys = {}
+    if store is not None:
+        from imdb_registry import run_key
+        for name, config in configs.items():
+            keys[name] = run_key(config, seed, data_options, **train_options)
+            record = store.get(keys[name])
+            if record is not None:
+                outcomes[name] = {
+                    "history": record["history"],
+                    "results": [record["test_loss"], record["test_accuracy"]],
+                    "wall_time": record["wall_time"],
+                    "peak_rss_mb": record["peak_rss_mb"],
+                    "cache_hit": True,
+                }
+    pending = {name: config for name, config in configs.items() if name not in outcomes}
+    if not pending:
+        outcomes["_total"] = time.perf_counter() - start
+        return outcomes
+    with make_pool(num_workers or len(pending), data_options, cores) as pool:
+        futures = [pool.submit(_run_variant, name, config, seed, train_options)
+                   for name, config in pending.items()]
+        for future in as_completed(futures):
+            name, outcome = future.result()
+            outcomes[name] = outcome
+            if store is not None:
+                store.put(keys[name], name, configs[name], seed, outcome)
+    outcomes["_total"] = time.perf_counter() - start
+    return outcomes
+
+
+if __name__ == "__main__":
+    from imdb_registry import ExperimentStore
+
+    args = sys.argv[1:]
+    options = dict(arg[2:].split("=", 1) for arg in args if arg.startswith("--") and "=" in arg)
+    precision = options.get("precision", "float32")
+    dtype = "bfloat16" if precision == "mixed_bfloat16" else "float32"
+    names = [arg for arg in args if not arg.startswith("--")] or list(VARIANTS)
+    store = ExperimentStore(options["store"]) if "store" in options else None
+    outcomes = run_sweep({name: variant_config(name) for name in names}, seed=0,
+                         dtype=dtype, store=store,
+                         early_stopping="--early-stopping" in args,
+                         profile="--profile" in args, precision=precision,
+                         **({"checkpoint_dir": options["checkpoint-dir"]}
+                            if "checkpoint-dir" in options else {}),
+                         **({"jit_compile": True} if "--jit" in args else {}))
+    for name in names:
+        outcome = outcomes[name]
+        loss, accuracy = outcome["results"]
+        print(f"{name:<22} loss {loss:.4f}  acc {accuracy:.4f}"
+              f"  {outcome.get('throughput', float('nan')):8.0f} ex/s"
+              f"  {outcome['peak_rss_mb'] or float('nan'):6.0f} MiB"
+              f"  {outcome['wall_time']:7.1f} s")
+        if outcome.get("perf"):
+            from imdb_profiling import perf_table
+            with open(f"{name}.perf.json", "w") as f:
+                json.dump(outcome["perf"], f, indent=1)
+            for phase, rows in outcome["perf"].items():
+                print(f"  {phase} fit\n" + perf_table(rows))
+    slowest = max(outcomes[name]["wall_time"] for name in names)
+    print(f"sweep: {outcomes['_total']:.1f} s (slowest config {slowest:.1f} s)")
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""Asynchronous successive halving (ASHA) for the hypertuning section.
+
+The search space is the one `model_Hyper` was picked from: 16-128 units,
+2 or 3 hidden layers, L2 factor, dropout, and mse vs binary_crossentropy.
+Every config starts on the lowest rung with `min_epochs` epochs. Whenever a
+worker is free it either promotes a config that is in the top `1 / eta` of
+its rung to the next rung (`eta` times more epochs) or starts a new config,
+so weak configs are dropped after a couple of epochs instead of being
+trained to completion.
+
+Trials run concurrently in the pinned worker pool from `imdb_sweep`.
+Promoted trials continue from their saved model (weights and optimizer
+state), so only the extra epochs of each rung are spent. Configs are ranked
+by `val_accuracy`, since the mse and crossentropy losses are not comparable.
+
+    python imdb_tuning.py
+"""
+
+import itertools
+import os
+import random
+import shutil
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+
+from imdb_models import DEFAULTS, build_model, split_validation
+from imdb_sweep import available_cores, make_pool, worker_data
+
+SEARCH_SPACE = {
+    "units": [16, 32, 64, 128],
+    "depth": [2, 3],
+    "l2": [None, 0.0001, 0.001],
+    "dropout": [None, 0.5],
+    "loss": ["mse", "binary_crossentropy"],
+}
+
+
+def grid(space=SEARCH_SPACE):
+    """Every model config of the search space."""
+    keys = list(space)
+    configs = []
+    for values in itertools.product(*(space[key] for key in keys)):
+        params = dict(zip(keys, values))
+        depth = params.pop("depth")
+        params["units"] = (params["units"],) * depth
+        configs.append({**DEFAULTS, **params})
+    return configs
+
+
+def rung_epochs(min_epochs, max_epochs, eta):
+    epochs = [min_epochs]
+    while epochs[-1] * eta < max_epochs:
+        epochs.append(epochs[-1] * eta)
+    if epochs[-1] < max_epochs:
+        epochs.append(max_epochs)
+    return epochs
+
+
+def _run_trial(config, path, from_epoch, to_epoch, seed, batch_size=512):
+    from tensorflow import keras
+
+    keras.utils.set_random_seed(seed)
+    data = worker_data()
+    partial_x_train, partial_y_train, x_val, y_val = split_validation(
+        data["x_train"], data["y_train"])
+    if from_epoch:
+        model = keras.models.load_model(path)
+    else:
+        model = build_model(config)
+    history = model.fit(partial_x_train,
+                        partial_y_train,
+                        initial_epoch=from_epoch,
+                        epochs=to_epoch,
+                        batch_size=batch_size,
+                        validation_data=(x_val, y_val),
+                        verbose=0)
+    model.save(path)
+    return history.history["val_accuracy"][-1]
+
+
+class ASHA:
+    """Bookkeeping of the rungs; decides what a free worker runs next."""
+
+    def __init__(self, configs, rungs, eta):
+        self.pending = list(configs)
+        self.rungs = rungs
+        self.eta = eta
+        # results[k] maps trial id -> val_accuracy at rung k.
+        self.results = [{} for _ in rungs]
+        self.promoted = [set() for _ in rungs]
+        self.configs = {}
+
+    def next_job(self):
+        """Return (trial id, rung) to run next, or None if nothing is left."""
+        for k in reversed(range(len(self.rungs) - 1)):
+            scores = self.results[k]
+            top = sorted(scores, key=scores.get, reverse=True)[:len(scores) // self.eta]
+            for trial in top:
+                if trial not in self.promoted[k]:
+                    self.promoted[k].add(trial)
+                    return trial, k + 1
+        if self.pending:
+            trial = len(self.configs)
+            self.configs[trial] = self.pending.pop(0)
+            return trial, 0
+        return None
+
+    def report(self, trial, rung, score):
+        self.results[rung][trial] = score
+
+    def best(self):
+        for scores in reversed(self.results):
+            if scores:
+                trial = max(scores, key=scores.get)
+                return self.configs[trial], scores[trial]
+        return None, None
+
+
+def run_asha(configs=None, min_epochs=1, max_epochs=20, eta=3, num_workers=None,
+             num_words=10000, seed=0, workdir=None):
+    """Tune over `configs` (default: the full grid) with ASHA.
+
+    `seed` fixes the order in which configs are started, and trial `i`
+    runs with `keras.utils.set_random_seed(seed + i)`. Trial models are
+    saved in `workdir`; without one they go to a temporary directory that
+    is removed afterwards.
+
+    Returns the best config, its validation accuracy, the epochs spent and
+    the epochs an exhaustive grid at `max_epochs` would have needed.
+    """
+    configs = grid() if configs is None else list(configs)
+    random.Random(seed).shuffle(configs)
+    rungs = rung_epochs(min_epochs, max_epochs, eta)
+    scheduler = ASHA(configs, rungs, eta)
+    tmpdir = None if workdir else tempfile.mkdtemp(prefix="asha-")
+    workdir = workdir or tmpdir
+    num_workers = num_workers or len(available_cores())
+    data_options = {"num_words": num_words, "encoding": "dense", "dtype": "float32"}
+
+    start = time.perf_counter()
+    epochs_spent = 0
+    running = {}
+    try:
+        with make_pool(num_workers, data_options) as pool:
+            while True:
+                while len(running) < num_workers:
+                    job = scheduler.next_job()
+                    if job is None:
+                        break
+                    trial, rung = job
+                    from_epoch = rungs[rung - 1] if rung else 0
+                    path = os.path.join(workdir, f"trial-{trial}.keras")
+                    future = pool.submit(_run_trial, scheduler.configs[trial], path,
+                                         from_epoch, rungs[rung], seed + trial)
+                    running[future] = (trial, rung, rungs[rung] - from_epoch)
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    trial, rung, epochs = running.pop(future)
+                    scheduler.report(trial, rung, future.result())
+                    epochs_spent += epochs
+    finally:
+        if tmpdir:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+    best_config, best_score = scheduler.best()
+    return {
+        "best_config": best_config,
+        "val_accuracy": best_score,
+        "epochs_spent": epochs_spent,
+        "grid_epochs": len(configs) * max_epochs,
+        "wall_time": time.perf_counter() - start,
+    }
+
+
+if __name__ == "__main__":
+    report = run_asha()
+    config = report["best_config"]
+    print("best config:", {key: config[key] for key in ["units", "l2", "dropout", "loss"]})
+    print(f"val_accuracy: {report['val_accuracy']:.4f}")
+    print(f"epochs spent: {report['epochs_spent']} "
+          f"(exhaustive grid: {report['grid_epochs']})")
+    print(f"wall time: {report['wall_time']:.1f} s")
@@ -0,0 +1,62 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+NUM_WORDS = 200
+
+
+def make_reviews(count, num_words=NUM_WORDS, seed=0):
+    """Random reviews; positive ones mention words 10-19, negative ones 20-29."""
+    rng = np.random.default_rng(seed)
+    labels = rng.integers(0, 2, count)
+    reviews = []
+    for label in labels:
+        cue = rng.integers(10, 20, 3) if label else rng.integers(20, 30, 3)
+        noise = rng.integers(30, num_words, rng.integers(5, 40))
+        reviews.append([1] + rng.permutation(np.r_[cue, noise]).tolist())
+    return reviews, labels.astype("float32")
+
+
+@pytest.fixture(scope="session")
+def reviews():
+    """Synthetic train/test reviews; train is longer than the 10000-row hold-out."""
+    train_data, y_train = make_reviews(10600, seed=0)
+    test_data, y_test = make_reviews(600, seed=1)
+    return {"train_data": train_data, "y_train": y_train,
+            "test_data": test_data, "y_test": y_test}
+
+
+@pytest.fixture(scope="session")
+def dense_data(reviews):
+    from imdb_encoding import vectorize_sequences
+    return {"x_train": vectorize_sequences(reviews["train_data"], NUM_WORDS, "float32"),
+            "x_test": vectorize_sequences(reviews["test_data"], NUM_WORDS, "float32"),
+            "y_train": reviews["y_train"], "y_test": reviews["y_test"]}
+
+
+@pytest.fixture(scope="session")
+def packed_data(reviews):
+    from imdb_encoding import pack_sequences
+    return {"x_train": pack_sequences(reviews["train_data"], NUM_WORDS),
+            "x_test": pack_sequences(reviews["test_data"], NUM_WORDS),
+            "y_train": reviews["y_train"], "y_test": reviews["y_test"]}
+
+
+@pytest.fixture
+def imdb_cache_dir(tmp_path, monkeypatch, dense_data):
+    """A dense float32 `imdb_cache` entry of the synthetic data, also seen by
+    spawned workers and subprocesses through the environment."""
+    import imdb_cache
+
+    cache_dir = str(tmp_path / "cache")
+    monkeypatch.setenv("IMDB_CACHE_DIR", cache_dir)
+    monkeypatch.setenv("KERAS_HOME", str(tmp_path / "keras"))
+    monkeypatch.setattr(imdb_cache, "CACHE_DIR", cache_dir)
+    arrays = {name: dense_data[name] for name in ["x_train", "x_test", "y_train", "y_test"]}
+    imdb_cache._write(imdb_cache.entry_dir(NUM_WORDS, "dense", "float32"), arrays, {},
+                      imdb_cache._meta(NUM_WORDS, "dense", "float32"))
+    return cache_dir
@@ -0,0 +1,79 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from imdb_checkpoint import AsyncCheckpointWriter, train_variant_resumable
+from imdb_models import variant_config
+
+
+class Interrupted(Exception):
+    pass
+
+
+class InterruptingWriter(AsyncCheckpointWriter):
+    """Stops training right after the `stop_after`-th checkpoint is on disk."""
+
+    def __init__(self, stop_after):
+        super().__init__()
+        self.stop_after = stop_after
+        self.writes = 0
+
+    def write(self, directory, arrays, state):
+        super().write(directory, arrays, state)
+        self.writes += 1
+        if self.writes == self.stop_after:
+            self.flush()
+            raise Interrupted
+
+
+CONFIG = variant_config("model_Dropout", epochs=2)
+
+
+def _train(directory, config=CONFIG, **options):
+    return train_variant_resumable("model_Dropout", config, options.pop("data"),
+                                   str(directory), seed=3, validation_epochs=3, **options)
+
+
+@pytest.fixture(scope="module")
+def uninterrupted(tmp_path_factory, dense_data):
+    return _train(tmp_path_factory.mktemp("full"), data=dense_data)
+
+
+@pytest.mark.parametrize("stop_after", [2, 4])
+def test_resumed_run_equals_uninterrupted_run(tmp_path, dense_data, uninterrupted,
+                                              stop_after):
+    writer = InterruptingWriter(stop_after)
+    with pytest.raises(Interrupted):
+        _train(tmp_path, data=dense_data, writer=writer)
+    writer.close()
+    resumed = _train(tmp_path, data=dense_data)
+    assert resumed["resumed"] is not None
+    assert resumed["history"] == uninterrupted["history"]
+    assert resumed["results"] == uninterrupted["results"]
+    for expected, actual in zip(uninterrupted["model"].get_weights(),
+                                resumed["model"].get_weights()):
+        np.testing.assert_array_equal(actual, expected)
+
+
+def test_finished_run_is_not_retrained(tmp_path, dense_data):
+    first = _train(tmp_path, data=dense_data)
+    again = _train(tmp_path, data=dense_data)
+    assert again["resumed"] == "finished"
+    assert again["results"] == first["results"]
+
+
+def test_changed_config_starts_over(tmp_path, dense_data):
+    writer = InterruptingWriter(2)
+    with pytest.raises(Interrupted):
+        _train(tmp_path, data=dense_data, writer=writer)
+    writer.close()
+    changed = _train(tmp_path, config=dict(CONFIG, dropout=0.25), data=dense_data)
+    assert changed["resumed"] is None
+    assert len(changed["history"]["loss"]) == 3
+    with open(os.path.join(tmp_path, "model_Dropout", "done.json")) as f:
+        run = json.load(f)["run"]
+    assert _train(tmp_path, data=dense_data)["resumed"] is None
+    with open(os.path.join(tmp_path, "model_Dropout", "done.json")) as f:
+        assert json.load(f)["run"] != run
@@ -0,0 +1,20 @@
+import os
+
+from imdb_cli import build_parser
+from imdb_models import variant_config
+from imdb_registry import ExperimentStore, run_key
+
+
+def test_train_reuses_a_stored_run(tmp_path, capsys):
+    store_path = str(tmp_path / "runs.sqlite")
+    models = str(tmp_path / "models")
+    data_options = {"num_words": 10000, "encoding": "dense", "dtype": "float32"}
+    key = run_key(variant_config("model_21"), 0, data_options)
+    outcome = {"history": {}, "results": [0.25, 0.875], "wall_time": 1.0}
+    ExperimentStore(store_path).put(key, "model_21", variant_config("model_21"), 0, outcome)
+
+    args = build_parser().parse_args(["train", "model_21", "--store", store_path,
+                                      "--models", models])
+    args.run(args)
+    assert "acc 0.8750" in capsys.readouterr().out
+    assert not os.path.exists(models)
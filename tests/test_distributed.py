@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from imdb_distributed import shard, train_data_parallel
+from imdb_models import variant_config
+
+from conftest import NUM_WORDS
+
+
+def test_shards_cover_the_training_set():
+    rows = [shard(10600, 3, rank) for rank in range(3)]
+    assert rows[0].start == 0 and rows[-1].stop == 10600
+    assert all(a.stop == b.start for a, b in zip(rows, rows[1:]))
+
+
+def test_batch_size_must_split_evenly():
+    with pytest.raises(ValueError):
+        train_data_parallel(variant_config("model"), num_workers=3, batch_size=512)
+
+
+def test_replicas_stay_bit_identical(imdb_cache_dir):
+    config = variant_config("model_regularisation")
+    outcome = train_data_parallel(config, num_workers=2, epochs=2, batch_size=512,
+                                  num_words=NUM_WORDS)
+    assert len(outcome["replica_digests"]) == 2
+    assert len(set(outcome["replica_digests"])) == 1
+    # The reported loss includes the L2 penalty, like Keras' own.
+    penalty = float(sum(outcome["model"].losses))
+    assert penalty > 0
+    assert outcome["history"]["loss"][-1] > penalty
+    assert np.isfinite(outcome["results"]).all()
+
+
+def test_replicas_with_dropout_stay_bit_identical(imdb_cache_dir):
+    outcome = train_data_parallel(variant_config("model_Dropout"), num_workers=2,
+                                  epochs=1, batch_size=512, num_words=NUM_WORDS)
+    assert len(set(outcome["replica_digests"])) == 1
+    assert np.isfinite(outcome["results"]).all()
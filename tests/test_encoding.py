@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+from tensorflow import keras
+
+from imdb_encoding import keras_inputs
+from imdb_models import build_model, train_variant, variant_config
+
+from conftest import NUM_WORDS
+
+
+def test_packed_rows_unpack_to_dense(dense_data, packed_data):
+    packed = packed_data["x_train"]
+    np.testing.assert_array_equal(packed.unpack(), dense_data["x_train"])
+    np.testing.assert_array_equal(packed[[3, 1, 4]], dense_data["x_train"][[3, 1, 4]])
+    np.testing.assert_array_equal(packed[10:20].unpack(), dense_data["x_train"][10:20])
+
+
+def test_packed_rows_refuse_implicit_densify(packed_data):
+    with pytest.raises(TypeError):
+        np.asarray(packed_data["x_train"])
+
+
+def test_packed_and_dense_evaluate_the_same(dense_data, packed_data):
+    keras.utils.set_random_seed(0)
+    model = build_model(variant_config("model"), num_words=NUM_WORDS)
+    model.build((None, NUM_WORDS))
+    dense = model.evaluate(**keras_inputs(dense_data["x_test"], dense_data["y_test"]),
+                           verbose=0)
+    packed = model.evaluate(**keras_inputs(packed_data["x_test"], packed_data["y_test"]),
+                            verbose=0)
+    np.testing.assert_allclose(packed, dense, rtol=1e-6)
+
+
+def test_packed_and_dense_fits_reach_the_same_accuracy(dense_data, packed_data):
+    # The two paths shuffle differently, so the runs are not bit-identical.
+    accuracies = {}
+    for encoding, data in [("dense", dense_data), ("packed", packed_data)]:
+        keras.utils.set_random_seed(0)
+        config = variant_config("model", units=(16, 16))
+        outcome = train_variant(config, data, validation_epochs=3)
+        assert len(outcome["history"]["val_loss"]) == 3
+        accuracies[encoding] = outcome["results"][1]
+    assert accuracies["dense"] > 0.8
+    assert abs(accuracies["packed"] - accuracies["dense"]) < 0.03
+
+
+def test_index_batches_gather_sorted_rows(dense_data, packed_data):
+    from imdb_encoding import IndexBatches
+
+    indices = np.array([7, 3, 11, 5, 2])
+    for x in [dense_data["x_train"], packed_data["x_train"]]:
+        batches = IndexBatches(x, dense_data["y_train"], indices, batch_size=2)
+        assert len(batches) == 3
+        inputs, labels = batches[0]
+        np.testing.assert_array_equal(inputs, dense_data["x_train"][[2, 3]])
+        np.testing.assert_array_equal(labels, dense_data["y_train"][[2, 3]])
+
+
+def test_index_batches_reshuffle_every_epoch(dense_data):
+    from imdb_encoding import IndexBatches
+
+    batches = IndexBatches(dense_data["x_train"], batch_size=100, shuffle=True, seed=0)
+    first = batches.order.copy()
+    batches.on_epoch_end()
+    assert not np.array_equal(first, batches.order)
+    np.testing.assert_array_equal(np.sort(batches.order), np.arange(len(first)))
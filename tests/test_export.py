@@ -0,0 +1,33 @@
+import numpy as np
+from tensorflow import keras
+
+from imdb_export import prune_weights
+from imdb_models import build_model, variant_config
+
+from conftest import NUM_WORDS
+
+
+def _model():
+    keras.utils.set_random_seed(0)
+    model = build_model(variant_config("model_Dropout"), num_words=NUM_WORDS)
+    model.build((None, NUM_WORDS))
+    return model
+
+
+def _zero_fraction(model):
+    return [float(np.mean(layer.get_weights()[0] == 0)) for layer in model.layers
+            if isinstance(layer, keras.layers.Dense)]
+
+
+def test_prune_weights_only_first_layer_by_default():
+    pruned = _zero_fraction(prune_weights(_model(), 0.5))
+    assert abs(pruned[0] - 0.5) < 0.01
+    assert all(fraction == 0 for fraction in pruned[1:])
+
+
+def test_prune_weights_selected_layers():
+    model = _model()
+    dense = [layer.name for layer in model.layers if isinstance(layer, keras.layers.Dense)]
+    pruned = _zero_fraction(prune_weights(model, 0.5, layers=dense[1:]))
+    assert pruned[0] == 0
+    assert all(abs(fraction - 0.5) < 0.05 for fraction in pruned[1:])
@@ -0,0 +1,50 @@
+import numpy as np
+import tensorflow as tf
+from tensorflow import keras
+
+from imdb_encoding import pad_token_sets
+from imdb_layers import TokenBagDense
+from imdb_models import build_model, variant_config
+
+from conftest import NUM_WORDS
+
+
+def _models(config):
+    keras.utils.set_random_seed(0)
+    dense = build_model(config, num_words=NUM_WORDS)
+    dense.build((None, NUM_WORDS))
+    token = build_model(config, token_input=True, num_words=NUM_WORDS)
+    token.build((None, None))
+    token.set_weights(dense.get_weights())
+    return dense, token
+
+
+def test_token_bag_dense_matches_dense(reviews, dense_data):
+    dense, token = _models(variant_config("model_regularisation"))
+    tokens = pad_token_sets(reviews["test_data"])
+    np.testing.assert_allclose(token.predict(tokens, verbose=0),
+                               dense.predict(dense_data["x_test"], verbose=0),
+                               rtol=1e-5, atol=1e-6)
+    np.testing.assert_allclose(sum(token.losses), sum(dense.losses), rtol=1e-6)
+
+
+def test_token_bag_dense_accepts_ragged_tokens(reviews, dense_data):
+    layer = TokenBagDense(4, input_dim=NUM_WORDS)
+    sets = [np.unique(review) for review in reviews["test_data"][:8]]
+    ragged = layer(tf.ragged.constant(sets))
+    padded = layer(pad_token_sets(reviews["test_data"][:8]))
+    expected = dense_data["x_test"][:8] @ layer.kernel.numpy() + layer.bias.numpy()
+    np.testing.assert_allclose(ragged, expected, rtol=1e-5, atol=1e-6)
+    np.testing.assert_allclose(padded, expected, rtol=1e-5, atol=1e-6)
+
+
+def test_token_bag_dense_trains_like_dense(reviews, dense_data):
+    dense, token = _models(variant_config("model_regularisation"))
+    tokens = pad_token_sets(reviews["train_data"][:512])
+    y = reviews["y_train"][:512]
+    for _ in range(3):
+        dense_loss = dense.train_on_batch(dense_data["x_train"][:512], y)
+        token_loss = token.train_on_batch(tokens, y)
+        np.testing.assert_allclose(token_loss, dense_loss, rtol=1e-5)
+    for expected, actual in zip(dense.get_weights(), token.get_weights()):
+        np.testing.assert_allclose(actual, expected, rtol=1e-4, atol=1e-6)
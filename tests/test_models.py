@@ -0,0 +1,37 @@
+import os
+
+import numpy as np
+import pytest
+from tensorflow import keras
+
+from imdb_checkpoint import train_variant_resumable
+from imdb_models import peak_rss_mb, train_variant, variant_config
+
+
+def test_variant_without_validation_fit(dense_data):
+    keras.utils.set_random_seed(0)
+    outcome = train_variant(variant_config("model_2", epochs=2), dense_data)
+    assert outcome["best_epoch"] is None
+    assert sorted(outcome["history"]) == ["accuracy", "loss"]
+    assert len(outcome["history"]["loss"]) == 2
+
+
+def test_resumable_variant_without_validation_fit(tmp_path, dense_data):
+    outcome = train_variant_resumable("model_2", variant_config("model_2", epochs=2),
+                                      dense_data, str(tmp_path))
+    assert sorted(outcome["history"]) == ["accuracy", "loss"]
+    assert len(outcome["history"]["loss"]) == 2
+
+
+@pytest.mark.skipif(not os.access("/proc/self/clear_refs", os.W_OK),
+                    reason="needs /proc/self/clear_refs")
+def test_peak_rss_is_measured_per_run(dense_data):
+    baseline = peak_rss_mb()
+    spike = np.ones(2**27)  # 1 GiB, touched
+    del spike
+    spiked = peak_rss_mb()
+    assert spiked > baseline + 900
+    keras.utils.set_random_seed(0)
+    outcome = train_variant(variant_config("model", epochs=1), dense_data,
+                            validation_epochs=1)
+    assert outcome["peak_rss_mb"] < spiked - 500
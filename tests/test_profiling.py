@@ -0,0 +1,59 @@
+import time
+
+import numpy as np
+from tensorflow import keras
+
+from imdb_models import build_model, train_variant, variant_config
+from imdb_profiling import PerfMonitor, perf_table
+
+from conftest import NUM_WORDS
+
+
+class SlowBatches(keras.utils.PyDataset):
+
+    def __init__(self, x, y, batch_size, delay):
+        super().__init__()
+        self.x, self.y = x, y
+        self.batch_size = batch_size
+        self.delay = delay
+
+    def __len__(self):
+        return len(self.x) // self.batch_size
+
+    def __getitem__(self, index):
+        time.sleep(self.delay)
+        batch = slice(index * self.batch_size, (index + 1) * self.batch_size)
+        return self.x[batch], self.y[batch]
+
+
+def test_slow_input_shows_up_as_input_time(dense_data):
+    model = build_model(variant_config("model"), num_words=NUM_WORDS)
+    monitor = PerfMonitor(batch_size=128)
+    slow = SlowBatches(dense_data["x_train"][:1280], dense_data["y_train"][:1280], 128, 0.1)
+    model.fit(monitor.timed(slow), epochs=2, callbacks=[monitor], verbose=0)
+    for row in monitor.epochs:
+        assert row["steps"] == 10
+        assert row["input_time"] >= 10 * 0.1
+        assert row["step_time"] <= row["epoch_time"]
+    assert "input(s)" in perf_table(monitor.epochs)
+
+
+def test_fast_input_is_not_input_bound(dense_data):
+    model = build_model(variant_config("model"), num_words=NUM_WORDS)
+    monitor = PerfMonitor(batch_size=128)
+    model.fit(monitor.timed(dense_data["x_train"][:1280], dense_data["y_train"][:1280],
+                            shuffle=True),
+              epochs=2, callbacks=[monitor], verbose=0)
+    for row in monitor.epochs:
+        assert row["steps"] == 10
+        assert 0 < row["input_time"] < 0.5
+
+
+def test_profiled_train_variant_reports_both_fits(packed_data):
+    keras.utils.set_random_seed(0)
+    outcome = train_variant(variant_config("model_21", epochs=1), packed_data,
+                            validation_epochs=2, profile=True)
+    assert [len(outcome["perf"][phase]) for phase in ["validation", "final"]] == [2, 1]
+    rows = outcome["perf"]["validation"]
+    assert all(row["input_time"] > 0 for row in rows)
+    assert np.isfinite(outcome["results"]).all()
@@ -0,0 +1,63 @@
+import os
+
+import numpy as np
+import pytest
+
+from imdb_models import peak_rss_mb, variant_config
+from imdb_registry import ExperimentStore, run_key, run_or_load
+
+
+def test_run_key_fills_in_defaults():
+    config = variant_config("model_21")
+    assert run_key(config, 0) == run_key(config, 0, early_stopping=False)
+    assert run_key(config, 0) == run_key(config, 0, precision="float32",
+                                         validation_epochs=20, batch_size=512)
+    assert run_key(config, 0) == run_key(config, 0, {"num_words": 10000})
+
+
+def test_run_key_ignores_reporting_options():
+    config = variant_config("model_21")
+    assert run_key(config, 0) == run_key(config, 0, verbose=2, logdir="logs",
+                                         trace_steps=(2, 4))
+
+
+def test_run_key_separates_different_runs():
+    config = variant_config("model_21")
+    keys = {run_key(config, 0), run_key(config, 1),
+            run_key(config, 0, early_stopping=True),
+            run_key(config, 0, precision="mixed_bfloat16"),
+            run_key(config, 0, {"dtype": "bfloat16"}),
+            run_key(config, 0, checkpoint_dir="a"),
+            run_key(variant_config("model_22"), 0)}
+    assert len(keys) == 7
+    assert run_key(config, 0, checkpoint_dir="a") == run_key(config, 0, checkpoint_dir="b")
+
+
+def test_store_round_trip(tmp_path):
+    store = ExperimentStore(str(tmp_path / "runs.sqlite"))
+    config = variant_config("model")
+    key = run_key(config, 0)
+    outcome = {"history": {"loss": [0.5]}, "results": [0.3, 0.9], "wall_time": 1.0}
+    store.put(key, "model", config, 0, outcome)
+    record = store.get(key)
+    assert record["test_accuracy"] == 0.9
+    assert record["history"] == {"loss": [0.5]}
+    assert store.latest_by_name()["model"]["config_hash"] == key
+
+
+@pytest.mark.skipif(not os.access("/proc/self/clear_refs", os.W_OK),
+                    reason="needs /proc/self/clear_refs")
+def test_stored_peak_rss_belongs_to_the_run(tmp_path, dense_data):
+    store = ExperimentStore(str(tmp_path / "runs.sqlite"))
+    options = {"validation_epochs": 1}
+    first = run_or_load(store, "model", variant_config("model", epochs=1), dense_data,
+                        **options)
+    spike = np.ones(2**27)  # 1 GiB, touched
+    spiked = peak_rss_mb()
+    del spike
+    second = run_or_load(store, "model_21", variant_config("model_21", epochs=1),
+                         dense_data, **options)
+    assert not second["cache_hit"]
+    assert first["peak_rss_mb"] < spiked - 500
+    assert second["peak_rss_mb"] < spiked - 500
+    assert store.get(second["config_hash"])["peak_rss_mb"] == second["peak_rss_mb"]
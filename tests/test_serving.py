@@ -0,0 +1,51 @@
+import asyncio
+
+import pytest
+from tensorflow import keras
+
+from imdb_models import build_model, variant_config
+from imdb_serving import OOV_CHAR, ReviewClassifier
+
+from conftest import NUM_WORDS
+
+
+@pytest.fixture(scope="module")
+def server():
+    keras.utils.set_random_seed(0)
+    model = build_model(variant_config("model"), num_words=NUM_WORDS)
+    return ReviewClassifier(model, num_words=NUM_WORDS, max_wait=0.05)
+
+
+def test_out_of_range_ids_map_to_oov(server):
+    async def run():
+        async with server:
+            return await asyncio.gather(server.predict([1, 5, NUM_WORDS + 1, -3]),
+                                        server.predict([1, 5, OOV_CHAR, OOV_CHAR]),
+                                        server.predict([1, 7]))
+    bad, clipped, good = asyncio.run(run())
+    assert bad == pytest.approx(clipped)
+    assert good == pytest.approx(server.predict_batch([[1, 7]])[0])
+
+
+def test_failing_request_does_not_fail_its_batch(server):
+    async def run():
+        async with server:
+            return await asyncio.gather(server.predict([1, 7]),
+                                        server.predict([[1, 2], [3, 4]]),
+                                        server.predict([1, 8]),
+                                        return_exceptions=True)
+    first, failed, last = asyncio.run(run())
+    assert isinstance(failed, Exception)
+    assert first == pytest.approx(server.predict_batch([[1, 7]])[0])
+    assert last == pytest.approx(server.predict_batch([[1, 8]])[0])
+
+
+def test_exit_cancels_unserved_requests(server):
+    async def run():
+        async with server:
+            server.worker.cancel()
+            task = asyncio.ensure_future(server.predict([1, 7]))
+            await asyncio.sleep(0)
+        return await asyncio.gather(task, return_exceptions=True)
+    (result,) = asyncio.run(run())
+    assert isinstance(result, asyncio.CancelledError)
@@ -0,0 +1,31 @@
+from tensorflow import keras
+
+from imdb_models import variant_config
+from imdb_supernet import split_history, train_heads
+
+
+def test_single_head(dense_data):
+    keras.utils.set_random_seed(0)
+    outcomes = train_heads({"model_23": variant_config("model_23", epochs=1)}, dense_data,
+                           validation_epochs=2)
+    outcome = outcomes["model_23"]
+    assert sorted(outcome["history"]) == ["accuracy", "loss", "val_accuracy", "val_loss"]
+    assert len(outcome["history"]["val_loss"]) == 2
+    assert outcome["results"][1] > 0.5
+
+
+def test_several_heads(dense_data):
+    keras.utils.set_random_seed(0)
+    configs = {name: variant_config(name, epochs=epochs)
+               for name, epochs in [("model", 1), ("model_21", 2), ("model_regularisation", 2)]}
+    outcomes = train_heads(configs, dense_data, validation_epochs=2)
+    for name in configs:
+        assert len(outcomes[name]["history"]["val_accuracy"]) == 2
+        assert len(outcomes[name]["results"]) == 2
+
+
+def test_split_history_does_not_mix_prefixed_names():
+    history = {"model_loss": [1], "model_21_loss": [2], "val_model_loss": [3]}
+    per_head = split_history(history, ["model", "model_21"])
+    assert per_head["model"] == {"loss": [1], "val_loss": [3]}
+    assert per_head["model_21"] == {"loss": [2]}